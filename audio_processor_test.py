@@ -0,0 +1,120 @@
+import numpy as np
+from src.audio_processor import detect_beats, detect_frequency_changes
+
+SAMPLERATE = 22050
+
+
+def reference_detect_beats(samples, sample_rate=44100, window_size=1024, hop_size=512, sensitivity=1.3):
+    """The Python loop detect_beats replaced, kept as the reference for its results."""
+    beat_idxs = []
+    avg_energy = 0.0
+    cooldown_in_frames = int(0.1 * sample_rate / hop_size)
+    init_frames = max(1, cooldown_in_frames)
+    energy_buffer = []
+    cooldown_counter = 0
+
+    for i in range(0, len(samples) - window_size + 1, hop_size):
+        window = samples[i:i+window_size]
+        energy = sum(sample**2 for sample in window) / window_size
+
+        if len(energy_buffer) < init_frames:
+            energy_buffer.append(energy)
+            if len(energy_buffer) >= init_frames:
+                avg_energy = sum(energy_buffer) / len(energy_buffer)
+            continue
+
+        avg_energy = 0.9 * avg_energy + 0.1 * energy
+
+        if cooldown_counter > 0:
+            cooldown_counter -= 1
+            continue
+
+        if energy > avg_energy * sensitivity:
+            beat_idxs.append(i)
+            cooldown_counter = cooldown_in_frames
+
+    return beat_idxs
+
+
+def reference_detect_frequency_changes(samples, sample_rate=44100, window_size=2048, hop_size=1024, sensitivity=0.3):
+    """The Python loop detect_frequency_changes replaced, kept as the reference for its results."""
+    freqchange_idxs = []
+    prev_avg_freq = None
+    cooldown_frames = int(0.2 * sample_rate / hop_size)
+    cooldown_counter = 0
+
+    freqs = np.fft.rfftfreq(window_size, 1/sample_rate)
+    freq_mask = (freqs >= 20) & (freqs <= 20000)
+    valid_freqs = freqs[freq_mask]
+
+    for i in range(0, len(samples) - window_size + 1, hop_size):
+        window = samples[i:i+window_size]
+
+        window_energy = np.mean(np.square(window))
+        if window_energy < 0.01:
+            continue
+
+        fft = np.fft.rfft(window)
+        magnitudes = np.abs(fft)[freq_mask]
+
+        if np.sum(magnitudes) == 0:
+            continue
+
+        avg_freq = np.sum(valid_freqs * magnitudes) / np.sum(magnitudes)
+
+        if prev_avg_freq is None:
+            prev_avg_freq = avg_freq
+            continue
+
+        if cooldown_counter > 0:
+            cooldown_counter -= 1
+            prev_avg_freq = 0.9 * prev_avg_freq + 0.1 * avg_freq
+            continue
+
+        relative_change = abs(avg_freq - prev_avg_freq) / prev_avg_freq
+
+        if relative_change > sensitivity:
+            freqchange_idxs.append(i)
+            cooldown_counter = cooldown_frames
+            prev_avg_freq = avg_freq
+        else:
+            prev_avg_freq = 0.9 * prev_avg_freq + 0.1 * avg_freq
+
+    return freqchange_idxs
+
+
+def synthetic_song(seconds=8, seed=0):
+    """
+    Float samples: a tone jumping to a new pitch every half second, noise, a click every 0.4 seconds
+    and a second of silence, which the frequency change detector skips.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * SAMPLERATE) / SAMPLERATE
+    pitches = rng.choice([110, 220, 440, 880, 1760, 3520], size=seconds * 2)[(t * 2).astype(int)]
+    samples = 0.5 * np.sin(2 * np.pi * pitches * t) + 0.05 * rng.standard_normal(len(t))
+    clicks = (t % 0.4) < 0.02
+    samples[clicks] += rng.standard_normal(clicks.sum())
+    samples[(t > 3) & (t < 4)] = 0.0
+    return samples
+
+
+def test_detect_beats_matches_the_python_loop():
+    for seed in range(3):
+        samples = synthetic_song(seed=seed)
+        for sensitivity in (1.1, 1.3, 2.0):
+            expected = reference_detect_beats(samples, SAMPLERATE, sensitivity=sensitivity)
+            assert len(expected) > 0
+            assert detect_beats(samples, SAMPLERATE, sensitivity=sensitivity).tolist() == expected
+
+
+def test_detect_frequency_changes_matches_the_python_loop():
+    for seed in range(3):
+        samples = synthetic_song(seed=seed)
+        for sensitivity in (0.1, 0.2, 0.3):
+            expected = reference_detect_frequency_changes(samples, SAMPLERATE, sensitivity=sensitivity)
+            assert len(expected) > 0
+            # A small block size makes the windows span several blocks
+            for windows_per_block in (1024, 7):
+                changes = detect_frequency_changes(samples, SAMPLERATE, sensitivity=sensitivity,
+                                                   windows_per_block=windows_per_block)
+                assert changes.tolist() == expected
@@ -0,0 +1,130 @@
+"""
+Time the graphics_generator draw functions per frame.
+
+Runs headless (SDL dummy video driver) on synthetic spectrum frames at several surface sizes.
+The waterfall is fed the frames as the history of a song playing one analysis frame per call, the
+waveform is drawn from the peaks of an hour-long synthetic song, its playhead also moving every call.
+With --python-only the pygame.draw primitives are replaced by no-ops, which leaves just the
+Python/NumPy work each draw function does per frame.
+
+Usage: python benchmarks/bench_graphics.py [--frames N] [--python-only]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import pygame
+from src import graphics_generator
+from src.peaks import PeakPyramid
+
+SIZES = [(640, 360), (1070, 400), (1920, 1080)]
+HISTORY_FRAMES = 1 << 16 # analysis frames of history the waterfall is fed before it starts over
+WAVEFORM_SECONDS = 3600 # length of the synthetic song the waveform is drawn from
+WAVEFORM_SAMPLERATE = 44100
+FRAME_SECONDS = 1024 / WAVEFORM_SAMPLERATE # how far the waveform's playhead moves per call
+
+
+def synthetic_frames(num_of_frames, num_of_bins=1025, seed=0):
+    """Random spectrum frames with a falling slope, normalized to 0-1 like the analysis' FFT magnitude envelopes."""
+    rng = np.random.default_rng(seed)
+    slope = 1 / (1 + np.arange(num_of_bins) / 20)
+    frames = np.abs(rng.normal(0, 1000, (num_of_frames, num_of_bins))) * slope
+    return (frames / frames.max()).astype(np.float32)
+
+
+class WaterfallDraw:
+    """
+    Draw a Waterfall (one per surface size) given the band_history of a song that moves one analysis
+    frame per call, as it does while playing, so every call adds one column.
+    """
+
+    def __init__(self):
+        self.waterfalls = {}
+        self.history = np.zeros((0, 0), dtype=np.float32)
+        self.frames_ready = 0
+
+    def __call__(self, surface, xf, yf):
+        if self.history.shape[1] != len(yf) or self.frames_ready == len(self.history):
+            self.history = np.zeros((HISTORY_FRAMES, len(yf)), dtype=np.float32)
+            self.frames_ready = 0
+        self.history[self.frames_ready] = yf
+        self.frames_ready += 1
+
+        key = (surface.get_size(), len(yf))
+        if key not in self.waterfalls:
+            self.waterfalls[key] = graphics_generator.Waterfall(surface.get_width(), surface.get_height(), len(yf))
+        self.waterfalls[key].draw(surface, yf, "BLUE", self.history[:self.frames_ready])
+
+
+def synthetic_peaks(seconds=WAVEFORM_SECONDS, samplerate=WAVEFORM_SAMPLERATE):
+    """PeakPyramid of a tone whose loudness swells every 30 seconds, built a minute at a time."""
+    num_of_samples = seconds * samplerate
+    peaks = PeakPyramid(samplerate, expected_samples=num_of_samples)
+    for start in range(0, num_of_samples, 60 * samplerate):
+        t = np.arange(start, min(start + 60 * samplerate, num_of_samples)) / samplerate
+        peaks.add(np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * t / 30)))
+    peaks.finish()
+    return peaks
+
+
+class WaveformDraw:
+    """Draw the waveform of an hour-long song, starting at its middle and playing one frame per call."""
+
+    def __init__(self):
+        self.peaks = None
+        self.calls = 0
+
+    def __call__(self, surface, xf, yf):
+        # Built on the first call, so it's only paid for when the waveform is benchmarked
+        if self.peaks is None:
+            self.peaks = synthetic_peaks()
+        song_time = WAVEFORM_SECONDS / 2 + self.calls * FRAME_SECONDS
+        self.calls += 1
+        graphics_generator.draw_waveform(surface, self.peaks, song_time, WAVEFORM_SECONDS, "BLUE")
+
+
+def visualizers():
+    return {
+        "spectrum": lambda surface, xf, yf: graphics_generator.draw_frequency_spectrum(surface, xf, yf, "BLUE"),
+        "circles": lambda surface, xf, yf: graphics_generator.draw_frequency_spectrum_circles(surface, xf, yf, "BLUE"),
+        "light spots": lambda surface, xf, yf: graphics_generator.draw_frequency_spectrum_light_spots(surface, xf, yf),
+        "waterfall": WaterfallDraw(),
+        "waveform": WaveformDraw(),
+    }
+
+
+def time_per_frame(draw, surface, xf, frames):
+    """Return the mean seconds per draw call over all the frames, after one warm up call."""
+    draw(surface, xf, frames[0])
+    start_time = time.perf_counter()
+    for yf in frames:
+        draw(surface, xf, yf)
+    return (time.perf_counter() - start_time) / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200, help="frames drawn per measurement")
+    parser.add_argument("--python-only", action="store_true", help="skip the pygame.draw rasterization")
+    args = parser.parse_args()
+
+    pygame.init()
+    if args.python_only:
+        for name in ("polygon", "lines", "circle"):
+            setattr(graphics_generator.py.draw, name, lambda *args, **kwargs: None)
+
+    frames = synthetic_frames(args.frames)
+    xf = np.fft.rfftfreq(2 * (frames.shape[1] - 1), 1 / 44100)
+    for name, draw in visualizers().items():
+        for size in SIZES:
+            seconds = time_per_frame(draw, pygame.Surface(size), xf, frames)
+            print(f"{name:12} {size[0]:>5}x{size[1]:<5} {seconds * 1000:8.3f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Time the cold start of the app: from launching the interpreter to the first frame of the startup window.
+
+Every run starts a fresh interpreter that launches the app the way main.py does, headless (SDL dummy
+drivers), and exits as soon as the "Drag and drop a file" window is first drawn. One more run with
+-X importtime breaks the time down into the slowest imports.
+
+Usage:
+    python benchmarks/bench_startup.py                # exit with 1 if the median is over the budget
+    python benchmarks/bench_startup.py --budget 0.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STARTUP_BUDGET = 0.5 # seconds from launch to the first frame of the startup window
+TOP_IMPORTS = 10 # slowest imports listed
+
+# Launches the app and exits when the window is first flipped
+LAUNCH_CODE = """
+import pygame
+from src.gui import run
+
+def first_flip():
+    flip()
+    raise SystemExit
+
+flip = pygame.display.flip
+pygame.display.flip = first_flip
+run([])
+"""
+
+
+def launch(*options):
+    """Launch the app in a fresh interpreter, return its wall time (sec) and stderr."""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    start_time = time.perf_counter()
+    result = subprocess.run([sys.executable, *options, "-c", LAUNCH_CODE], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    seconds = time.perf_counter() - start_time
+    if result.returncode != 0:
+        raise RuntimeError(f"the app failed to start:\n{result.stderr}")
+    return seconds, result.stderr
+
+
+def slowest_imports(importtime_output, count=TOP_IMPORTS):
+    """
+    Parse -X importtime output into the slowest imports.
+
+    Returns:
+    - List of (cumulative_us, self_us, module) of the "count" imports with the highest cumulative time,
+      only counting modules the app or the interpreter imported directly (not their submodules)
+    """
+    imports = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level
+        if len(module) - len(module.lstrip()) <= 1:
+            imports.append((int(cumulative_us), int(self_us), module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timed launches, the median counts")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET, help="allowed time to window (sec)")
+    args = parser.parse_args()
+
+    launch() # warm up the file system cache and the .pyc files
+    times = [launch()[0] for _ in range(args.repeat)]
+    median = statistics.median(times)
+
+    _, importtime_output = launch("-X", "importtime")
+    print(f"{'import':40} {'cumulative':>12} {'self':>10}")
+    for cumulative_us, self_us, module in slowest_imports(importtime_output):
+        print(f"{module:40} {cumulative_us / 1000:9.1f} ms {self_us / 1000:7.1f} ms")
+
+    print(f"time to window: median {median * 1000:.0f} ms | min {min(times) * 1000:.0f} ms"
+          f" | max {max(times) * 1000:.0f} ms | budget {args.budget * 1000:.0f} ms")
+    if median > args.budget:
+        print(f"OVER BUDGET by {(median - args.budget) * 1000:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Benchmark the audio_processor and graphics_generator hot paths and compare them with a saved baseline.
+
+The audio functions run on a synthetic song (tones, noise and a beat every half second, the same for
+every run) written to a temporary .wav file for each duration. The song is also encoded to FLAC and
+OGG, to compare analyzing them with the streaming decoders against decoding them to a .wav first.
+Stereo versions at higher sampling rates are analyzed at their own rate and resampled to the
+analysis rate, to show the cost per second of audio no longer depends on the format.
+The draw functions run headless on
+synthetic band frames at the sizes in bench_graphics. Every benchmark records:
+- wall_s: Best wall time over the repeats (for draw functions, per frame)
+- peak_bytes: Peak memory traced by tracemalloc during one run (NumPy arrays included)
+- retained_bytes: Memory still allocated after that run, e.g. the returned arrays
+- surfaces_per_frame: Surfaces and fonts created per frame (draw functions only)
+- realtime_factor: Seconds of audio processed per second (audio functions only)
+
+Usage:
+    python benchmarks/run_benchmarks.py --save             # record benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --threshold 0.2    # exit with 1 if anything got >20% worse
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import pygame
+import soundfile
+from scipy.io import wavfile
+from src import audio_processor
+from src.analysis import analyze_song
+from src.render import allocations
+from bench_graphics import SIZES, synthetic_frames, visualizers
+
+SAMPLERATE = 44100
+DURATIONS = [10, 60, 600, 3600] # seconds of audio the audio functions are benchmarked on
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+CHUNK_SECONDS = 60 # the synthetic song is generated and written this many seconds at a time
+NUM_OF_BANDS = 128 # values per frame the visualizers draw
+COMPRESSED_FORMATS = {"flac": "PCM_16", "ogg": "VORBIS"} # encodings the decoders are benchmarked on
+HIGH_RATES = [48000, 96000, 192000] # rates of the stereo songs analyzed with and without resampling
+HIGH_RATE_MAX_DURATION = 600 # longer high rate songs would take gigabytes of disk space
+# Differences smaller than these are noise, whatever their ratio
+MIN_DELTAS = {"wall_s": 0.0001, "peak_bytes": 64 * 1024}
+
+
+def synthetic_song(path, duration, seed=0, samplerate=SAMPLERATE, channels=1):
+    """
+    Write an int16 .wav of "duration" seconds: a tone changing every 4 seconds, noise and beats, the
+    same in every channel.
+    """
+    rng = np.random.default_rng(seed)
+    tones = np.array([110, 220, 330, 440, 880, 1760])
+    with wave.open(path, "wb") as file:
+        file.setnchannels(channels)
+        file.setsampwidth(2)
+        file.setframerate(samplerate)
+        for start in range(0, duration * samplerate, CHUNK_SECONDS * samplerate):
+            t = np.arange(start, min(start + CHUNK_SECONDS * samplerate, duration * samplerate)) / samplerate
+            tone = np.sin(2 * np.pi * tones[(t // 4).astype(int) % len(tones)] * t)
+            beat = np.exp(-(t % 0.5) * 30) * rng.normal(0, 1, len(t))
+            signal = np.clip(6000 * tone + 8000 * beat + rng.normal(0, 300, len(t)), -32768, 32767).astype(np.int16)
+            file.writeframes(np.repeat(signal, channels).tobytes())
+
+
+def encode(wav_path, path, subtype, block_size=65536):
+    """Re-encode a .wav file with soundfile, a block at a time."""
+    with soundfile.SoundFile(wav_path) as source:
+        with soundfile.SoundFile(path, "w", source.samplerate, source.channels, subtype) as target:
+            for block in source.blocks(block_size, dtype="int16"):
+                target.write(block)
+
+
+def convert_then_analyze(path, directory):
+    """What streaming replaces: decode the whole file into a temporary .wav, then analyze that."""
+    data, samplerate = soundfile.read(path, dtype="int16")
+    wav_path = os.path.join(directory, "converted.wav")
+    wavfile.write(wav_path, samplerate, data)
+    del data
+    return analyze_song(wav_path)
+
+
+def measure(func, repeat):
+    """Run func "repeat" times for the wall time, then once more under tracemalloc for the memory."""
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"wall_s": min(times), "peak_bytes": peak, "retained_bytes": retained}
+
+
+def audio_benchmarks(durations, repeat):
+    """Yield (name, results) of every audio_processor benchmark."""
+    audio_processor.compile_kernels()
+    with tempfile.TemporaryDirectory() as directory:
+        for duration in durations:
+            path = os.path.join(directory, f"song_{duration}.wav")
+            synthetic_song(path, duration)
+            _, _, _, ydata, samples = audio_processor.load_song(path)
+
+            benchmarks = {
+                "load_song": lambda: audio_processor.load_song(path),
+                "process_frequency_data": lambda: audio_processor.process_frequency_data(ydata, SAMPLERATE),
+                "detect_beats": lambda: audio_processor.detect_beats(samples, SAMPLERATE),
+                "detect_frequency_changes": lambda: audio_processor.detect_frequency_changes(samples, SAMPLERATE),
+                "analyze_song[wav]": lambda: analyze_song(path),
+            }
+            for extension, subtype in COMPRESSED_FORMATS.items():
+                encoded_path = os.path.join(directory, f"song_{duration}.{extension}")
+                encode(path, encoded_path, subtype)
+                benchmarks[f"analyze_song[{extension}]"] = lambda p=encoded_path: analyze_song(p)
+                benchmarks[f"convert_then_analyze[{extension}]"] = lambda p=encoded_path: convert_then_analyze(p, directory)
+            for rate in HIGH_RATES if duration <= HIGH_RATE_MAX_DURATION else []:
+                high_rate_path = os.path.join(directory, f"song_{duration}_{rate}.wav")
+                synthetic_song(high_rate_path, duration, samplerate=rate, channels=2)
+                label = f"{rate // 1000}kHz stereo"
+                benchmarks[f"analyze_song[{label}, native]"] = (
+                    lambda p=high_rate_path: analyze_song(p, analysis_rate=None, downmix=False))
+                benchmarks[f"analyze_song[{label}, resampled]"] = lambda p=high_rate_path: analyze_song(p)
+
+            for name, func in benchmarks.items():
+                results = measure(func, repeat)
+                results["realtime_factor"] = duration / results["wall_s"]
+                yield f"{name}/{duration}s", results
+            del ydata, samples
+
+
+def graphics_benchmarks(num_of_frames, repeat):
+    """Yield (name, results) of every graphics_generator draw function at every size, per frame."""
+    pygame.init()
+    frames = synthetic_frames(num_of_frames, NUM_OF_BANDS)
+    xf = np.geomspace(30, SAMPLERATE / 2, NUM_OF_BANDS)
+    for name, draw in visualizers().items():
+        for size in SIZES:
+            surface = pygame.Surface(size)
+            draw(surface, xf, frames[0]) # warm up the per-size caches
+
+            def draw_all():
+                for yf in frames:
+                    draw(surface, xf, yf)
+
+            allocations.end_frame()
+            results = measure(draw_all, repeat)
+            results["wall_s"] /= num_of_frames
+            results["surfaces_per_frame"] = allocations.end_frame() / (num_of_frames * (repeat + 1))
+            yield f"{name}/{size[0]}x{size[1]}", results
+
+
+def compare(results, baseline, threshold):
+    """
+    Return the regressions: (name, metric, ratio) for every metric more than "threshold" worse, and by
+    more than its MIN_DELTAS.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, min_delta in MIN_DELTAS.items():
+            before = baseline.get(name, {}).get(metric)
+            if before and metrics[metric] / before > 1 + threshold and metrics[metric] - before > min_delta:
+                regressions.append((name, metric, metrics[metric] / before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=int, nargs="+", default=DURATIONS, help="song lengths (sec)")
+    parser.add_argument("--frames", type=int, default=100, help="frames drawn per draw function measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the best one counts")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline .json to compare with or save to")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown/memory growth (0.25 = 25%%)")
+    parser.add_argument("--skip-audio", action="store_true", help="only run the draw function benchmarks")
+    parser.add_argument("--skip-graphics", action="store_true", help="only run the audio benchmarks")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = {}
+    benchmarks = []
+    if not args.skip_audio:
+        benchmarks.append(audio_benchmarks(args.durations, args.repeat))
+    if not args.skip_graphics:
+        benchmarks.append(graphics_benchmarks(args.frames, args.repeat))
+    print(f"{'benchmark':48} {'wall':>12} {'peak':>10} {'retained':>10} {'real time':>10} {'vs baseline':>12}")
+    for benchmark in benchmarks:
+        for name, metrics in benchmark:
+            results[name] = metrics
+            before = baseline.get(name, {}).get("wall_s")
+            ratio = f"{metrics['wall_s'] / before:.2f}x" if before else "-"
+            realtime = f"{metrics['realtime_factor']:.0f}x" if "realtime_factor" in metrics else "-"
+            print(f"{name:48} {metrics['wall_s'] * 1000:9.3f} ms {metrics['peak_bytes'] / 2 ** 20:7.1f} MB"
+                  f" {metrics['retained_bytes'] / 2 ** 20:7.1f} MB {realtime:>10} {ratio:>12}")
+
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f"Saved the baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, metric, ratio in regressions:
+        print(f"REGRESSION {name} {metric}: {ratio:.2f}x the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import numpy as np
+from src.analysis import Analysis, analysis_params
+from src.cache import AnalysisCache
+
+
+def fake_analysis(seed=0):
+    analysis = Analysis(22050, 2048, 1024)
+    rng = np.random.default_rng(seed)
+    analysis.spectra = rng.random((100, len(analysis.freqs))).astype(np.float32)
+    analysis.frames_ready = 100
+    analysis.beats = np.sort(rng.uniform(0, 4, 10))
+    return analysis
+
+
+def write_song(path, contents):
+    with open(path, "wb") as file:
+        file.write(contents)
+    return str(path)
+
+
+def entry_path(cache, song_path, params):
+    return cache.entry_path(cache.key(song_path, params))
+
+
+def test_changed_parameters_miss(tmp_path):
+    cache = AnalysisCache(tmp_path / "cache")
+    song_path = write_song(tmp_path / "song.wav", b"song" * 1000)
+    params = analysis_params()
+    cache.store(song_path, params, fake_analysis())
+
+    loaded = cache.load(song_path, params)
+    np.testing.assert_array_equal(loaded.spectra, fake_analysis().spectra)
+    np.testing.assert_array_equal(loaded.beats, fake_analysis().beats)
+    assert loaded.frames_ready == 100
+
+    for changed in (analysis_params(num_of_bands=64), analysis_params(normalization="global"),
+                    analysis_params(features=["beats"])):
+        assert not cache.contains(song_path, changed)
+        assert cache.load(song_path, changed) is None
+    # The same features in another order are the same analysis
+    assert cache.contains(song_path, analysis_params(features=list(reversed(params["features"]))))
+
+
+def test_changed_file_misses(tmp_path):
+    cache = AnalysisCache(tmp_path / "cache")
+    song_path = write_song(tmp_path / "song.wav", b"a" * 1000)
+    params = analysis_params()
+    cache.store(song_path, params, fake_analysis())
+    assert cache.contains(song_path, params)
+
+    # Different size
+    write_song(song_path, b"a" * 1001)
+    assert cache.load(song_path, params) is None
+
+    # Same size, different contents and modification time
+    write_song(song_path, b"b" * 1000)
+    stat = os.stat(song_path)
+    os.utime(song_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.load(song_path, params) is None
+
+    # Back to the original contents, which are only touched, hits again: entries are keyed on the contents
+    write_song(song_path, b"a" * 1000)
+    os.utime(song_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    assert cache.load(song_path, params) is not None
+
+
+def test_eviction_removes_the_least_recently_used(tmp_path):
+    params = analysis_params()
+    songs = [write_song(tmp_path / f"song{i}.wav", bytes([i]) * 1000) for i in range(3)]
+    cache = AnalysisCache(tmp_path / "cache")
+    cache.store(songs[0], params, fake_analysis(0))
+    entry_size = os.path.getsize(entry_path(cache, songs[0], params))
+    # Room for two entries
+    cache.max_bytes = 2 * entry_size + entry_size // 2
+    cache.store(songs[1], params, fake_analysis(1))
+
+    # Song 0 was stored first but is used again after song 1
+    os.utime(entry_path(cache, songs[0], params), (1000, 1000))
+    os.utime(entry_path(cache, songs[1], params), (2000, 2000))
+    assert cache.load(songs[0], params) is not None
+
+    cache.store(songs[2], params, fake_analysis(2))
+    assert [cache.contains(song_path, params) for song_path in songs] == [True, False, True]
+    total_bytes = sum(os.path.getsize(os.path.join(cache.cache_dir, name))
+                      for name in os.listdir(cache.cache_dir) if name.endswith(".npz"))
+    assert total_bytes <= cache.max_bytes
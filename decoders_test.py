@@ -0,0 +1,36 @@
+import numpy as np
+from src.decoders import Resampler
+
+
+def linear_resampler(in_rate, out_rate):
+    """A Resampler using the linear interpolation fallback, as when soxr isn't installed."""
+    resampler = Resampler(in_rate, out_rate)
+    resampler.stream = None
+    return resampler
+
+
+def resample_in_blocks(resampler, samples, block_sizes):
+    blocks = []
+    start = 0
+    for size in block_sizes:
+        blocks.append(resampler.resample(samples[start:start + size]))
+        start += size
+    return np.concatenate(blocks + [resampler.resample(samples[start:], last=True)])
+
+
+def test_linear_resampler_carries_skipped_samples_over():
+    resampler = linear_resampler(3, 1)
+    samples = np.arange(16, dtype=np.float32)
+    resampled = resample_in_blocks(resampler, samples, [8, 8])
+    assert resampled.tolist() == [0, 3, 6, 9, 12, 15]
+
+
+def test_linear_resampler_blocks_match_one_call():
+    rng = np.random.default_rng(0)
+    samples = rng.standard_normal(20000).astype(np.float32)
+    for in_rate, out_rate in [(96000, 44100), (192000, 44100), (22050, 44100), (48000, 44100), (3, 1)]:
+        whole = linear_resampler(in_rate, out_rate).resample(samples, last=True)
+        for block_sizes in ([1] * 50 + [7, 3000, 1], rng.integers(1, 5000, 10).tolist()):
+            blocks = resample_in_blocks(linear_resampler(in_rate, out_rate), samples, block_sizes)
+            assert len(blocks) == len(whole), (in_rate, out_rate)
+            np.testing.assert_allclose(blocks, whole, rtol=1e-5, atol=1e-5)
@@ -0,0 +1,68 @@
+import numpy as np
+from src.analysis import analyze, StreamingAnalyzer
+
+SAMPLERATE = 22050
+FEATURES = ("spectrum", "bands")
+
+
+def fading_signal():
+    """A few seconds of tones and noise getting quieter, so the loudest part is at the start."""
+    rng = np.random.default_rng(0)
+    t = np.arange(6 * SAMPLERATE) / SAMPLERATE
+    tones = np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 3000 * t * (1 + t / 6))
+    loudness = np.where(t < 1, 1.0, 0.1) * (1 + 0.5 * np.sin(2 * np.pi * 2 * t))
+    return ((tones + 0.2 * rng.standard_normal(len(t))) * loudness * 10000).astype(np.float32)
+
+
+def stream(samples, block_sizes, **params):
+    analyzer = StreamingAnalyzer(SAMPLERATE, features=FEATURES, **params)
+    start = 0
+    for size in block_sizes:
+        analyzer.feed(samples[start:start + size])
+        start += size
+    analyzer.feed(samples[start:])
+    analyzer.finish()
+    return analyzer.analysis
+
+
+def reference_envelopes(frames, frame_rate, attack, release):
+    """Attack/release envelope followers over every value, one frame at a time."""
+    attack, release = np.exp(-1 / (attack * frame_rate)), np.exp(-1 / (release * frame_rate))
+    envelope = np.zeros(frames.shape[1])
+    envelopes = np.zeros(frames.shape)
+    for i, frame in enumerate(frames.astype(np.float64)):
+        coefficient = np.where(frame > envelope, attack, release)
+        envelope = frame + coefficient * (envelope - frame)
+        envelopes[i] = envelope
+    return envelopes
+
+
+def test_streaming_matches_one_shot():
+    samples = fading_signal()
+    rng = np.random.default_rng(1)
+    for normalization in ("rolling", "global"):
+        whole = analyze(samples, SAMPLERATE, features=FEATURES, normalization=normalization)
+        for block_sizes in ([1, 511, 1024, 7], rng.integers(1, 20000, 12).tolist()):
+            streamed = stream(samples, block_sizes, normalization=normalization)
+            assert streamed.frames_ready == whole.frames_ready
+            for name in ("spectra", "bands"):
+                np.testing.assert_allclose(getattr(streamed, name), getattr(whole, name), rtol=1e-5, atol=1e-6,
+                                           err_msg=f"{normalization} {name} {block_sizes}")
+
+
+def test_global_normalization_divides_by_the_loudest_envelope():
+    samples = fading_signal()
+    # Without attack and release the frames are only divided by their loudest value, and the envelope
+    # followers don't depend on the scale of their input
+    unsmoothed = analyze(samples, SAMPLERATE, features=FEATURES, attack=0, release=0, normalization="global")
+    smoothed = analyze(samples, SAMPLERATE, features=FEATURES, attack=0.01, release=0.15, normalization="global")
+    for name in ("spectra", "bands"):
+        envelopes = reference_envelopes(getattr(unsmoothed, name), smoothed.frame_rate, 0.01, 0.15)
+        np.testing.assert_allclose(getattr(smoothed, name), envelopes / envelopes.max(), rtol=1e-4, atol=1e-6,
+                                   err_msg=name)
+        assert getattr(smoothed, name).max() == 1.0
+
+    # Rolling normalization forgets the loud start, so the quiet part is drawn louder
+    rolling = analyze(samples, SAMPLERATE, features=FEATURES, normalization="rolling")
+    quiet = slice(int(4 * smoothed.frame_rate), None)
+    assert rolling.bands[quiet].max() > 2 * smoothed.bands[quiet].max()
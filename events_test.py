@@ -0,0 +1,98 @@
+import numpy as np
+from src.events import EventIndex, SEEK_BUCKET_SECONDS
+from src.scheduler import FrameScheduler
+
+# Three events in the first bucket, two sharing a time, one exactly on a bucket boundary and an empty bucket
+TIMES = np.array([0.25, 0.5, 0.5, 1.0, 1.75, 3.5, 3.99, 4.0])
+
+
+def seek_times(times):
+    """Times before the first event, exactly on each event, on every bucket boundary and past the last event."""
+    boundaries = np.arange(0, times[-1] + 2 * SEEK_BUCKET_SECONDS, SEEK_BUCKET_SECONDS)
+    return np.concatenate([[-1.0, 0.0, 0.1], times, np.nextafter(times, -np.inf), boundaries,
+                           [times[-1] + 0.01, times[-1] + 100]])
+
+
+def test_seek_matches_searchsorted():
+    index = EventIndex(TIMES)
+    for time in seek_times(TIMES):
+        index.seek(time)
+        assert index.cursor == np.searchsorted(TIMES, time, side="right"), time
+
+
+def test_seek_after_extend_matches_searchsorted():
+    # The background analysis hands over longer and longer prefixes of the same events
+    index = EventIndex()
+    for end in range(len(TIMES) + 1):
+        index.extend(TIMES[:end])
+        for time in seek_times(TIMES):
+            index.seek(time)
+            assert index.cursor == np.searchsorted(TIMES[:end], time, side="right"), (end, time)
+
+
+def test_seek_random_events():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.uniform(0, 60, 500))
+    index = EventIndex(times[:100])
+    index.extend(times)
+    for time in np.concatenate([seek_times(times), rng.uniform(-5, 70, 1000)]):
+        index.seek(time)
+        assert index.cursor == np.searchsorted(times, time, side="right"), time
+
+
+def test_pop_until_after_seek():
+    index = EventIndex(TIMES)
+    index.seek(1.0)
+    assert index.last() == 1.0
+    assert index.pop_until(1.0).tolist() == []
+    assert index.pop_until(3.99).tolist() == [1.75, 3.5, 3.99]
+    index.seek(0.3)
+    assert index.pop_until(0.5).tolist() == [0.5, 0.5]
+    index.seek(-1.0)
+    assert index.last() is None
+    index.seek(10.0)
+    assert index.pop_until(100.0).tolist() == []
+
+
+def test_scheduler_seek():
+    scheduler = FrameScheduler(frame_rate=100)
+    scheduler.frame_at(scheduler.song_time(0), frames_ready=10000)
+    scheduler.seek(42.0)
+    # get_pos restarts from 0 after play(start=42)
+    assert abs(scheduler.song_time(0) - 42.0) < 0.01
+    index, fraction = scheduler.frame_at(42.0, frames_ready=10000)
+    assert (index, fraction) == (4200, 0.0)
+    # The jump is neither drift nor skipped frames
+    assert scheduler.num_of_drifts == 0
+    assert scheduler.frames_skipped == 0
+
+    scheduler.seek(0.0)
+    assert scheduler.song_time(0) < 0.01
+    assert scheduler.frame_at(0.0, frames_ready=10000) == (0, 0.0)
+    assert scheduler.frames_skipped == 0 and scheduler.frames_repeated == 0
+
+
+def test_scheduler_holds_the_end_of_the_song():
+    scheduler = FrameScheduler(frame_rate=100)
+    # get_pos is -1 before the song starts playing
+    assert scheduler.song_time(-1, duration=5.1) == 0.0
+    scheduler.song_time(0, duration=5.1)
+    scheduler.song_time(5060, duration=5.1)
+    num_of_drifts = scheduler.num_of_drifts
+
+    # and again once it has ended
+    for _ in range(3):
+        assert scheduler.song_time(-1, duration=5.1) == 5.1
+    assert scheduler.frame_at(5.1, frames_ready=500) == (499, 0.0)
+    assert scheduler.num_of_drifts == num_of_drifts
+
+    # Without the duration the last position is held
+    scheduler.seek(2.0)
+    scheduler.song_time(0)
+    held = scheduler.song_time(1000)
+    assert 3.0 <= scheduler.song_time(-1) == held < 3.1
+
+    # Playing again after a seek restarts the clock
+    scheduler.seek(1.0)
+    assert scheduler.song_time(-1, duration=5.1) == 1.0
+    assert 1.0 <= scheduler.song_time(0, duration=5.1) < 1.1
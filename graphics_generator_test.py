@@ -0,0 +1,37 @@
+import os
+
+# Draw without a display, this has to be set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from src.graphics_generator import Waterfall
+
+WIDTH, HEIGHT, NUM_OF_BANDS = 200, 60, 32
+
+
+def draw(waterfall, bands, index, color="BLUE"):
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    waterfall.draw(surface, bands[index], color, bands[:index + 1])
+    return pygame.image.tobytes(surface, "RGB")
+
+
+def test_waterfall_only_depends_on_the_song_time():
+    rng = np.random.default_rng(0)
+    bands = rng.random((1000, NUM_OF_BANDS)).astype(np.float32)
+
+    # Played through in order, skipping and repeating frames, with a colour change
+    played = Waterfall(WIDTH, HEIGHT, NUM_OF_BANDS)
+    pictures = {}
+    index = 0
+    while index < len(bands) - 1:
+        index = min(index + int(rng.integers(0, 4)), len(bands) - 1)
+        color = "BLUE" if index < 500 else "RED"
+        pictures[index, color] = draw(played, bands, index, color)
+
+    # Seeking around, as after a seek, a mode switch or in an export worker, gives the same pictures
+    seeking = Waterfall(WIDTH, HEIGHT, NUM_OF_BANDS)
+    for key in rng.permutation(list(pictures))[:100]:
+        index, color = int(key[0]), str(key[1])
+        assert draw(seeking, bands, index, color) == pictures[index, color], (index, color)
+        assert draw(Waterfall(WIDTH, HEIGHT, NUM_OF_BANDS), bands, index, color) == pictures[index, color]
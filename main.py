@@ -1,7 +1,9 @@
-import os
+import sys
+from src.gui import run
 
 def main():
-    os.system(f'python src/gui.py')
+    # Start the app in this process, launching a second interpreter would import everything twice
+    run(sys.argv[1:])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import numpy as np
+from src.peaks import PeakPyramid, PEAK_BLOCK_SIZE
+
+SAMPLERATE = 8000
+
+
+def build(samples, block_sizes, expected_samples=None):
+    pyramid = PeakPyramid(SAMPLERATE, expected_samples=expected_samples)
+    start = 0
+    for size in block_sizes:
+        pyramid.add(samples[start:start + size])
+        start += size
+    pyramid.add(samples[start:])
+    pyramid.finish()
+    return pyramid
+
+
+def brute_force_columns(samples, level, start_time, end_time, width):
+    """The min and max of every column, straight from the samples of the rows it covers."""
+    size = PEAK_BLOCK_SIZE << level
+    num_of_rows = -(-len(samples) // size)
+    row_times = np.linspace(start_time, end_time, width + 1) * SAMPLERATE / size
+    edges = np.floor(row_times).astype(np.int64)
+    mins = np.zeros(width, dtype=np.float32)
+    maxs = np.zeros(width, dtype=np.float32)
+    for column in range(width):
+        first = max(edges[column], 0)
+        end = min(max(edges[column + 1], first + 1), num_of_rows)
+        if row_times[column + 1] > 0 and first < num_of_rows:
+            mins[column] = samples[first * size:end * size].min()
+            maxs[column] = samples[first * size:end * size].max()
+    return mins, maxs
+
+
+def test_every_level_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for trial in range(20):
+        num_of_samples = int(rng.integers(1, 100000))
+        samples = rng.standard_normal(num_of_samples).astype(np.float32)
+        # Odd block sizes make rows span several add calls, a too small expected length makes the pyramid grow
+        block_sizes = rng.integers(1, 20000, 10).tolist()
+        expected_samples = [None, num_of_samples, num_of_samples // 3 + 1][trial % 3]
+        pyramid = build(samples, block_sizes, expected_samples)
+
+        assert pyramid.rows_ready == -(-num_of_samples // PEAK_BLOCK_SIZE)
+        # The last, incomplete block counts as a whole one
+        assert 0 <= pyramid.duration * SAMPLERATE - num_of_samples < PEAK_BLOCK_SIZE
+        for level in range(pyramid.num_of_levels):
+            size = PEAK_BLOCK_SIZE << level
+            num_of_rows = -(-num_of_samples // size)
+            blocks = [samples[row * size:(row + 1) * size] for row in range(num_of_rows)]
+            expected = np.array([[block.min(), block.max()] for block in blocks])
+            np.testing.assert_array_equal(pyramid.level(level)[:num_of_rows], expected, err_msg=f"level {level}")
+
+
+def test_columns_match_brute_force():
+    rng = np.random.default_rng(1)
+    samples = rng.standard_normal(200000).astype(np.float32)
+    pyramid = build(samples, [12345, 1, 70000])
+    duration = len(samples) / SAMPLERATE
+    for width in (1, 7, 300, 1070):
+        # From a fraction of a row per column to the whole song and beyond, starting before, in and after it
+        for span in (0.005, 0.1, 2.0, duration, 3 * duration):
+            for start_time in (-span / 3, -0.001, 0.0, 0.37, duration - span / 2, duration + 1):
+                mins, maxs = pyramid.columns(start_time, start_time + span, width)
+                samples_per_column = max(span * SAMPLERATE / width, 1)
+                level = min(max(int(np.log2(samples_per_column / PEAK_BLOCK_SIZE)), 0), pyramid.num_of_levels - 1)
+                expected_mins, expected_maxs = brute_force_columns(samples, level, start_time, start_time + span, width)
+                np.testing.assert_array_equal(mins, expected_mins, err_msg=f"{width} {span} {start_time}")
+                np.testing.assert_array_equal(maxs, expected_maxs, err_msg=f"{width} {span} {start_time}")
+
+
+def test_column_reaching_into_the_song_is_not_silent():
+    samples = np.full(PEAK_BLOCK_SIZE * 64, 0.5, dtype=np.float32)
+    pyramid = build(samples, [])
+    # One column spanning from well before the start into the song
+    mins, maxs = pyramid.columns(-1.0, 1.0, 1)
+    assert (mins[0], maxs[0]) == (0.5, 0.5)
+    # Columns entirely before the start stay silent
+    mins, maxs = pyramid.columns(-1.0, 1.0, 4)
+    assert maxs.tolist() == [0.0, 0.0, 0.5, 0.5]
@@ -0,0 +1,5 @@
+import sys
+from .gui import run
+
+# python -m src [--live [audio file]]
+run(sys.argv[1:])
@@ -0,0 +1,514 @@
+import inspect
+import threading
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .audio_processor import (beat_kernel, new_beat_state, frequency_change_kernel, new_frequency_change_state,
+                             envelope_kernel, new_envelope_state, spectral_centroids, band_matrix)
+from .decoders import open_decoder, Resampler
+from .peaks import PeakPyramid
+
+# Everything the analysis can compute, visualizers request the ones they need
+FEATURES = ("bands", "beats", "frequency changes", "spectrum", "waveform")
+# Ways the spectrum frames and bands can be normalized
+NORMALIZATIONS = ("global", "rolling")
+ROLLING_PEAK_RELEASE = 5.0 # seconds the loudest value of the rolling normalization takes to fall by a factor of e
+# Parameters of analyze_song that prepare the decoded audio for analyze, and their defaults
+PREPROCESSING = {
+    "analysis_rate": 44100, # every song is resampled to this rate (Hz) so the cost only depends on its length, None keeps the song's rate
+    "downmix": True, # average the channels into mono, False only analyzes the first channel
+}
+
+
+class Analysis:
+    """
+    Everything the visualizer needs from one analysis pass over a song.
+
+    Attributes:
+    - samplerate: Sampling rate of the analyzed samples (Hz)
+    - window_size: FFT window size of the spectrum frames
+    - hop_size: Samples between consecutive spectrum frames
+    - freqs: Frequency of each spectrum bin (Hz)
+    - spectra: float32 matrix (frames x frequency bins) of FFT magnitude envelopes normalized to 0-1,
+      (frames x 0) when the spectrum wasn't requested
+    - band_freqs: Center frequency of each band (Hz)
+    - bands: float32 matrix (frames x bands) of the FFT magnitudes reduced to log- or mel-spaced bands,
+      enveloped and normalized to 0-1 the same way, (frames x 0) when the bands weren't requested
+    - frames_ready: Number of spectrum frames analyzed so far, the rest are still zero
+    - beats: Array of beat times (sec)
+    - freq_changes: Array of significant frequency change times (sec)
+    - peaks: Flat float32 array (rows x 2) of the min/max peak pyramid of the samples (see
+      peaks.PeakPyramid), a single zero row when the waveform wasn't requested
+    - peaks_ready: Number of finest level rows of "peaks" computed so far
+    - timings: Seconds spent in each stage of the analysis, in the order they ran
+    """
+
+    def __init__(self, samplerate, window_size, hop_size):
+        self.samplerate = samplerate
+        self.window_size = window_size
+        self.hop_size = hop_size
+        self.freqs = np.fft.rfftfreq(window_size, 1 / samplerate)
+        self.spectra = np.zeros((0, len(self.freqs)), dtype=np.float32)
+        self.band_freqs = np.zeros(0)
+        self.bands = np.zeros((0, 0), dtype=np.float32)
+        self.frames_ready = 0
+        self.beats = np.zeros(0)
+        self.freq_changes = np.zeros(0)
+        self.peaks = np.zeros((1, 2), dtype=np.float32)
+        self.peaks_ready = 0
+        self.timings = {}
+
+    @property
+    def frame_rate(self):
+        """Number of spectrum frames per second of audio."""
+        return self.samplerate / self.hop_size
+
+    @property
+    def complete(self):
+        """Whether every spectrum frame has been analyzed."""
+        return self.frames_ready == len(self.spectra)
+
+    def peak_pyramid(self):
+        """Return a PeakPyramid over the peaks computed so far, for drawing the waveform."""
+        # The analyzing thread replaces "peaks" before counting its new rows as ready
+        peaks_ready = self.peaks_ready
+        return PeakPyramid(self.samplerate, self.peaks, peaks_ready)
+
+    def report(self):
+        """Return the stage timings as a single printable line."""
+        stages = [f"{stage}: {seconds * 1000:.1f} ms" for stage, seconds in self.timings.items()]
+        stages.append(f"total: {sum(self.timings.values()) * 1000:.1f} ms")
+        return " | ".join(stages)
+
+
+def analyze(samples, samplerate, window_size=2048, hop_size=1024, beat_window_size=1024, beat_hop_size=512,
+            beat_sensitivity=1.3, change_sensitivity=0.3, num_of_bands=128, band_scale="log", features=FEATURES,
+            attack=0.01, release=0.15, normalization="rolling", frames_per_block=1024):
+    """
+    Analyze audio samples in a single pass.
+
+    Takes the same parameters as analyze_progressively.
+    Returns:
+    - An Analysis of the samples
+    """
+    for analysis in analyze_progressively(samples, samplerate, window_size, hop_size, beat_window_size,
+                                          beat_hop_size, beat_sensitivity, change_sensitivity, num_of_bands,
+                                          band_scale, features, attack, release, normalization, frames_per_block):
+        pass
+    return analysis
+
+
+def analyze_progressively(samples, samplerate, window_size=2048, hop_size=1024, beat_window_size=1024,
+                          beat_hop_size=512, beat_sensitivity=1.3, change_sensitivity=0.3, num_of_bands=128,
+                          band_scale="log", features=FEATURES, attack=0.01, release=0.15, normalization="rolling",
+                          frames_per_block=1024):
+    """
+    Analyze audio samples in a single pass, one block of frames at a time.
+
+    Parameters:
+    - samples: 1-D array of audio samples
+    - samplerate: Sampling rate in Hz
+    - window_size: FFT window size of the spectrum frames (default: 2048)
+    - hop_size: Samples between consecutive spectrum frames (default: 1024)
+    - beat_window_size: Number of samples per beat detection window (default: 1024)
+    - beat_hop_size: Samples between consecutive beat detection windows (default: 512)
+    - beat_sensitivity: Beat detection sensitivity (higher = fewer beats) (default: 1.3)
+    - change_sensitivity: Relative frequency change threshold (0-1) (default: 0.3)
+    - num_of_bands: Number of bands the spectrum frames are reduced to (default: 128)
+    - band_scale: Spacing of the bands, "log" or "mel" (default: "log")
+    - features: Which of FEATURES to compute (default: all of them)
+    - attack: Time (sec) the envelopes of the spectrum frames and bands take to rise by 1 - 1/e of a jump (default: 0.01)
+    - release: Time (sec) they take to fall by 1 - 1/e of a drop (default: 0.15)
+    - normalization: Divide the envelopes by the loudest value of the whole song ("global") or of the
+      last few seconds ("rolling") (default: "rolling")
+    - frames_per_block: Number of frames analyzed per step, bounds the temporary memory used (default: 1024)
+    Yields:
+    - The same Analysis after every block, with "frames_ready" spectrum frames filled in and the
+      beats and frequency changes found up to them
+    """
+    samples = np.asarray(samples)
+    analyzer = StreamingAnalyzer(samplerate, window_size, hop_size, beat_window_size, beat_hop_size,
+                                 beat_sensitivity, change_sensitivity, num_of_bands, band_scale, features,
+                                 attack, release, normalization, expected_samples=len(samples))
+
+    samples_per_block = frames_per_block * hop_size
+    for start in range(0, max(len(samples), 1), samples_per_block):
+        analyzer.feed(samples[start:start + samples_per_block])
+        yield analyzer.analysis
+    analyzer.finish()
+
+
+class StreamingAnalyzer:
+    """
+    Analyze audio fed in blocks of any size, keeping rolling state between blocks.
+
+    The samples are squared and summed once into energies of "beat_hop_size" blocks, which every window
+    energy is built from, and transformed once into one STFT, which gives both the spectrum frames and
+    the average frequencies used by the frequency change detector. Every frame and window is analyzed
+    as soon as all of its samples have arrived, so the results are the same as analyzing everything at
+    once, and only the samples and energies still needed by an unfinished window are kept.
+
+    Parameters:
+    - samplerate: Sampling rate in Hz
+    - window_size: FFT window size of the spectrum frames (default: 2048)
+    - hop_size: Samples between consecutive spectrum frames (default: 1024)
+    - beat_window_size: Number of samples per beat detection window (default: 1024)
+    - beat_hop_size: Samples between consecutive beat detection windows (default: 512)
+    - beat_sensitivity: Beat detection sensitivity (higher = fewer beats) (default: 1.3)
+    - change_sensitivity: Relative frequency change threshold (0-1) (default: 0.3)
+    - num_of_bands: Number of bands the spectrum frames are reduced to (default: 128)
+    - band_scale: Spacing of the bands, "log" or "mel" (default: "log")
+    - features: Which of FEATURES to compute (default: all of them). The STFT is skipped when none of
+      the spectrum, bands or frequency changes are requested
+    - attack, release, normalization: How the spectrum frames and bands are enveloped and normalized,
+      see analyze_progressively. With "global", frames are divided by the loudest value so far until
+      finish rescales them all to the loudest value of the whole stream
+    - expected_samples: Total number of samples when it is known up front, so the spectra and peaks can
+      be preallocated
+    - keep_spectra: Keep every spectrum frame in the Analysis (default: True). When False, its "spectra"
+      and "bands" only hold the frames from the last block, so memory stays bounded on an endless stream
+      apart from the waveform peaks, which take up to 20 MB per hour at 44.1 kHz
+    """
+
+    def __init__(self, samplerate, window_size=2048, hop_size=1024, beat_window_size=1024, beat_hop_size=512,
+                 beat_sensitivity=1.3, change_sensitivity=0.3, num_of_bands=128, band_scale="log", features=FEATURES,
+                 attack=0.01, release=0.15, normalization="rolling", expected_samples=None, keep_spectra=True):
+        unknown = set(features) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"unknown analysis features: {', '.join(sorted(unknown))}")
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"unknown normalization: {normalization} (expected one of {', '.join(NORMALIZATIONS)})")
+        for size in (window_size, hop_size, beat_window_size):
+            if size % beat_hop_size:
+                raise ValueError(f"window and hop sizes must be multiples of beat_hop_size ({beat_hop_size})")
+
+        self.window_size = window_size
+        self.hop_size = hop_size
+        self.beat_window_size = beat_window_size
+        self.beat_hop_size = beat_hop_size
+        self.beat_sensitivity = beat_sensitivity
+        self.change_sensitivity = change_sensitivity
+        self.keep_spectra = keep_spectra
+        self.features = set(features)
+        self.normalization = normalization
+
+        self.analysis = Analysis(samplerate, window_size, hop_size)
+        self.analysis.timings = dict.fromkeys(["energy", "stft", "envelope", "beats", "frequency changes", "peaks"],
+                                              0.0)
+        if "bands" in self.features:
+            self.band_matrix, self.analysis.band_freqs = band_matrix(samplerate, window_size, num_of_bands, band_scale)
+
+        # Without the spectrum or bands only the number of frames is kept, for the progress
+        self.widths = {"spectra": len(self.analysis.freqs) if "spectrum" in self.features else 0,
+                       "bands": num_of_bands if "bands" in self.features else 0}
+        num_of_frames = 0 if expected_samples is None else max(0, (expected_samples - window_size) // hop_size + 1)
+        for name, width in self.widths.items():
+            setattr(self.analysis, name, np.zeros((num_of_frames, width), dtype=np.float32))
+        if "waveform" in self.features:
+            self.peak_pyramid = PeakPyramid(samplerate, expected_samples=expected_samples)
+            self.analysis.peaks = self.peak_pyramid.peaks
+
+        # Envelope follower coefficients: the share of the envelope kept from one frame to the next
+        frame_rate = self.analysis.frame_rate
+        self.attack = np.exp(-1 / (attack * frame_rate)) if attack > 0 else 0.0
+        self.release = np.exp(-1 / (release * frame_rate)) if release > 0 else 0.0
+        self.peak_decay = 1.0 if normalization == "global" else np.exp(-1 / (ROLLING_PEAK_RELEASE * frame_rate))
+        self.envelope_states = {name: new_envelope_state(width) for name, width in self.widths.items()}
+        # Loudest value each frame was divided by, for rescaling to the global one at the end
+        self.frame_peaks = {name: [] for name in self.widths}
+
+        # Samples and block energies that an unfinished frame or window still needs,
+        # with the position of the first one in the whole stream
+        self.samples = np.zeros(0)
+        self.samples_start = 0
+        self.energies = np.zeros(0)
+        self.energies_start = 0
+
+        # Detector state carried from one block to the next
+        self.beat_state = new_beat_state()
+        self.beat_cooldown = int(0.1 * samplerate / beat_hop_size)
+        self.beat_windows_done = 0
+        self.change_state = new_frequency_change_state()
+        self.change_cooldown = int(0.2 * samplerate / hop_size)
+
+    def feed(self, samples):
+        """
+        Analyze a block of samples following the ones fed before.
+
+        Parameters:
+        - samples: 1-D array of audio samples
+        Returns:
+        - spectra: float32 matrix of the spectrum frames completed by this block
+        - beats: Array of the beat times (sec) found in this block
+        - freq_changes: Array of the frequency change times (sec) found in this block
+        """
+        analysis = self.analysis
+        samplerate = analysis.samplerate
+        window_size, hop_size, beat_hop_size = self.window_size, self.hop_size, self.beat_hop_size
+        blocks_per_window = window_size // beat_hop_size
+        blocks_per_hop = hop_size // beat_hop_size
+        blocks_per_beat_window = self.beat_window_size // beat_hop_size
+
+        self.samples = np.concatenate([self.samples, np.asarray(samples, dtype=np.float64)])
+        samples_end = self.samples_start + len(self.samples)
+
+        # Energies of the newly completed blocks, all window energies are sums of consecutive blocks
+        start_time = time.perf_counter()
+        blocks_done = self.energies_start + len(self.energies)
+        blocks_ready = samples_end // beat_hop_size
+        chunk = self.samples[blocks_done * beat_hop_size - self.samples_start:
+                             blocks_ready * beat_hop_size - self.samples_start].reshape(-1, beat_hop_size)
+        self.energies = np.concatenate([self.energies, np.einsum("ij,ij->i", chunk, chunk)])
+        analysis.timings["energy"] += time.perf_counter() - start_time
+
+        # One STFT of the newly completed frames for the spectrum frames and the average frequencies
+        start_time = time.perf_counter()
+        frames_done = analysis.frames_ready
+        frames_ready = max(frames_done, (samples_end - window_size) // hop_size + 1)
+        if frames_ready > frames_done and self.features & {"spectrum", "bands", "frequency changes"}:
+            segment = self.samples[frames_done * hop_size - self.samples_start:
+                                   (frames_ready - 1) * hop_size + window_size - self.samples_start]
+            windows = sliding_window_view(segment, window_size)[::hop_size]
+            magnitudes = np.abs(np.fft.rfft(windows, axis=1))
+        else:
+            magnitudes = np.zeros((frames_ready - frames_done, len(analysis.freqs)))
+        spectra = magnitudes[:, :self.widths["spectra"]].astype(np.float32)
+        # Reduce the frames to bands in one matrix product
+        if "bands" in self.features:
+            bands = magnitudes.astype(np.float32) @ self.band_matrix
+        else:
+            bands = np.zeros((len(magnitudes), 0), dtype=np.float32)
+        centroids, has_magnitude = spectral_centroids(magnitudes, analysis.freqs)
+        analysis.timings["stft"] += time.perf_counter() - start_time
+
+        # Smooth and normalize the new frames once here, so the renderers don't have to every frame
+        start_time = time.perf_counter()
+        spectra = self.envelope("spectra", spectra)
+        self.store_frames("spectra", spectra, frames_done, frames_ready)
+        bands = self.envelope("bands", bands)
+        self.store_frames("bands", bands, frames_done, frames_ready)
+        analysis.timings["envelope"] += time.perf_counter() - start_time
+
+        # Beats for every window whose blocks are ready
+        start_time = time.perf_counter()
+        beat_windows_ready = max(self.beat_windows_done, blocks_ready - blocks_per_beat_window + 1)
+        if "beats" not in self.features:
+            self.beat_windows_done = beat_windows_ready
+        beat_energies = window_sums(self.energies[self.beat_windows_done - self.energies_start:
+                                                  beat_windows_ready + blocks_per_beat_window - 1 - self.energies_start],
+                                    blocks_per_beat_window, 1) / self.beat_window_size
+        beat_windows = beat_kernel(beat_energies, self.beat_state, max(1, self.beat_cooldown), self.beat_cooldown,
+                                   self.beat_sensitivity) + self.beat_windows_done
+        beats = beat_windows * beat_hop_size / samplerate
+        analysis.beats = np.concatenate([analysis.beats, beats])
+        self.beat_windows_done = beat_windows_ready
+        analysis.timings["beats"] += time.perf_counter() - start_time
+
+        # Frequency changes, skipping frames that are too quiet or have no magnitude
+        start_time = time.perf_counter()
+        frame_energies = window_sums(self.energies[frames_done * blocks_per_hop - self.energies_start:],
+                                     blocks_per_window, blocks_per_hop)[:frames_ready - frames_done]
+        frame_idxs = np.flatnonzero((frame_energies / window_size >= 0.01) & has_magnitude)
+        if "frequency changes" not in self.features:
+            frame_idxs = frame_idxs[:0]
+        changes = frequency_change_kernel(centroids[frame_idxs], self.change_state, self.change_cooldown,
+                                          self.change_sensitivity)
+        freq_changes = (frame_idxs[changes] + frames_done) * hop_size / samplerate
+        analysis.freq_changes = np.concatenate([analysis.freq_changes, freq_changes])
+        analysis.timings["frequency changes"] += time.perf_counter() - start_time
+
+        analysis.frames_ready = frames_ready
+
+        # Min/max peaks of the new samples at every zoom level of the waveform
+        if "waveform" in self.features:
+            start_time = time.perf_counter()
+            self.peak_pyramid.add(samples)
+            self.store_peaks()
+            analysis.timings["peaks"] += time.perf_counter() - start_time
+
+        # Drop the samples and energies every stage is done with
+        samples_needed = min(blocks_ready * beat_hop_size, frames_ready * hop_size)
+        self.samples = self.samples[samples_needed - self.samples_start:]
+        self.samples_start = samples_needed
+        energies_needed = min(self.beat_windows_done, frames_ready * blocks_per_hop)
+        self.energies = self.energies[energies_needed - self.energies_start:]
+        self.energies_start = energies_needed
+
+        return spectra, beats, freq_changes
+
+    def finish(self):
+        """
+        End the stream: summarize the samples of the last peak block, trim the frame matrices to the
+        frames analyzed, in case the expected number of samples was only an estimate, and with global
+        normalization rescale them to the loudest value of the whole stream.
+        """
+        if "waveform" in self.features:
+            self.peak_pyramid.finish()
+            self.store_peaks()
+        if self.keep_spectra:
+            for name in self.widths:
+                setattr(self.analysis, name, getattr(self.analysis, name)[:self.analysis.frames_ready])
+                loudest = self.envelope_states[name][-1]
+                if self.normalization == "global" and self.widths[name] and loudest > 0:
+                    frame_peaks = np.concatenate(self.frame_peaks[name] + [np.zeros(0)])
+                    getattr(self.analysis, name)[:] *= (frame_peaks / loudest).astype(np.float32)[:, np.newaxis]
+
+    def envelope(self, name, frames):
+        """Run new frames of one of the frame matrices through its envelope followers and normalization."""
+        if self.widths[name] == 0:
+            return frames
+        envelopes, peaks = envelope_kernel(frames, self.envelope_states[name], self.attack, self.release,
+                                           self.peak_decay)
+        if self.normalization == "global" and self.keep_spectra:
+            self.frame_peaks[name].append(peaks)
+        return envelopes
+
+    def store_peaks(self):
+        """Publish the peak pyramid in the Analysis, the array before the number of rows ready."""
+        self.analysis.peaks = self.peak_pyramid.peaks
+        self.analysis.peaks_ready = self.peak_pyramid.rows_ready
+
+    def store_frames(self, name, frames, frames_done, frames_ready):
+        """Put newly completed frames into one of the Analysis' frame matrices, growing it if needed."""
+        analysis = self.analysis
+        if not self.keep_spectra:
+            setattr(analysis, name, frames)
+            return
+
+        stored = getattr(analysis, name)
+        if frames_ready > len(stored):
+            grown = np.zeros((max(frames_ready, 2 * len(stored)), self.widths[name]), dtype=np.float32)
+            grown[:frames_done] = stored[:frames_done]
+            setattr(analysis, name, grown)
+            stored = grown
+        stored[frames_done:frames_ready] = frames
+
+
+def analysis_params(**params):
+    """Return every parameter of analyze_song that changes its results, filling in the defaults."""
+    defaults = {name: parameter.default for name, parameter in inspect.signature(analyze).parameters.items()
+                if parameter.default is not inspect.Parameter.empty and name != "frames_per_block"}
+    defaults.update(PREPROCESSING)
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise TypeError(f"unknown analysis parameters: {', '.join(sorted(unknown))}")
+    params = dict(defaults, **params)
+    # The same features in any order give the same analysis
+    params["features"] = sorted(set(params["features"]))
+    return params
+
+
+def analyze_song(song_path, cache=None, **params):
+    """
+    Decode and analyze a song, reusing a cached analysis when there is one.
+
+    Parameters:
+    - song_path: Path string to audio file, in any format decoders.open_decoder supports
+    - cache: AnalysisCache to read from and store into (default: no caching)
+    - params: Parameters passed on to analyze, and the PREPROCESSING ones
+    Returns:
+    - An Analysis of the song mixed down to mono, at the analysis rate
+    """
+    for analysis in analyze_song_progressively(song_path, cache, **params):
+        pass
+    return analysis
+
+
+def analyze_song_progressively(song_path, cache=None, **params):
+    """
+    Decode and analyze a song one block at a time, reusing a cached analysis when there is one.
+
+    The song is decoded in blocks that are mixed down to mono, resampled to the analysis rate and
+    fed straight into a StreamingAnalyzer, so only one block of decoded samples is in memory at a
+    time, whatever the format.
+
+    Takes the same parameters as analyze_song.
+    Yields:
+    - The same Analysis once the song is opened and after every decoded block (only once, complete,
+      when it was cached)
+    """
+    params = analysis_params(**params)
+    if cache is not None:
+        analysis = cache.load(song_path, params)
+        if analysis is not None:
+            yield analysis
+            return
+
+    analyzer_params = {name: value for name, value in params.items() if name not in PREPROCESSING}
+    with open_decoder(song_path) as decoder:
+        samplerate = params["analysis_rate"] or decoder.samplerate
+        resampler = Resampler(decoder.samplerate, samplerate) if samplerate != decoder.samplerate else None
+        expected_samples = round(decoder.frames * samplerate / decoder.samplerate)
+        # Mixing down as a matrix product is much faster than averaging along the rows
+        weights = np.full(decoder.channels, 1 / decoder.channels, dtype=np.float32)
+        analyzer = StreamingAnalyzer(samplerate, expected_samples=expected_samples, **analyzer_params)
+        analysis = analyzer.analysis
+        analysis.timings = dict(decode=0.0, preprocess=0.0, **analysis.timings)
+        yield analysis
+
+        for block in decoder.blocks():
+            analysis.timings["decode"] = decoder.seconds
+            start_time = time.perf_counter()
+            samples = block @ weights if params["downmix"] and decoder.channels > 1 else block[:, 0]
+            if resampler is not None:
+                samples = resampler.resample(samples)
+            analysis.timings["preprocess"] += time.perf_counter() - start_time
+
+            analyzer.feed(samples)
+            yield analysis
+
+        if resampler is not None:
+            analyzer.feed(resampler.resample(np.zeros(0, dtype=np.float32), last=True))
+        analyzer.finish()
+
+    if cache is not None:
+        cache.store(song_path, params, analysis)
+
+
+class BackgroundAnalysis:
+    """
+    Analyze a song on a worker thread, so the caller can keep running while the Analysis fills in.
+
+    Parameters:
+    - song_path: Path string to audio file
+    - cache: AnalysisCache to read from and store into (default: no caching)
+    - params: Parameters passed on to analyze
+    """
+
+    def __init__(self, song_path, cache=None, **params):
+        self.analysis = None
+        self.error = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(song_path, cache, params), daemon=True)
+        self.thread.start()
+
+    def run(self, song_path, cache, params):
+        try:
+            for analysis in analyze_song_progressively(song_path, cache, **params):
+                self.analysis = analysis
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    @property
+    def progress(self):
+        """Fraction (0-1) of the song analyzed so far."""
+        if self.analysis is None:
+            return 0.0
+        if self.analysis.complete:
+            return 1.0
+        return self.analysis.frames_ready / len(self.analysis.spectra)
+
+    def ready(self, seconds):
+        """Check if at least the first "seconds" of the song (or all of it) have been analyzed."""
+        if self.analysis is None:
+            return False
+        return self.analysis.complete or self.analysis.frames_ready >= seconds * self.analysis.frame_rate
+
+
+def window_sums(block_energies, blocks_per_window, blocks_per_hop):
+    """Sum the energies of the blocks covered by each window."""
+    if len(block_energies) < blocks_per_window:
+        return np.zeros(0)
+    return sliding_window_view(block_energies, blocks_per_window)[::blocks_per_hop].sum(axis=1)
@@ -1,8 +1,40 @@
 
-from scipy.io import wavfile
-import librosa
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import numpy as np
-from scipy.fft import fft, fftfreq
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Compile a function with numba the first time it is called
+"""
+Falls back to running the plain Python function when numba isn't installed.
+Importing numba is slow, so it is only done once a kernel is actually needed. The compiled
+kernels are cached on disk next to this file, so only the first run pays for compiling them.
+"""
+def lazy_jit(func):
+
+    compiled = []
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        if not compiled:
+            try:
+                from numba import njit
+                compiled.append(njit(nogil=True, cache=True)(func))
+            except ImportError:
+                compiled.append(func)
+        return compiled[0](*args)
+
+    return wrapper
+
+# Compile the detector kernels ahead of time
+"""
+Kernels compile on their first call, which takes about a second. Calling this first moves that
+delay out of latency sensitive code.
+"""
+def compile_kernels():
+    beat_kernel(np.zeros(1), new_beat_state(), 1, 1, 1.0)
+    frequency_change_kernel(np.ones(1), new_frequency_change_state(), 1, 1.0)
+    envelope_kernel(np.zeros((1, 1), dtype=np.float32), new_envelope_state(1), 0.0, 0.0, 1.0)
 
 # Load and process audio data from .wav file
 """
@@ -13,74 +45,118 @@ Returns:
 - samplerate: The sample rate of the audio file (Hz)
 - duration_in_sec: Duration of the audio file (sec)
 - num_of_channels: Number of channels encoded into the audio file
-- ydata: A list of audio samples from the file split into chunks of length "samples_per_chunk"
-- ydata_for_line: A list of audio samples from the file
+- ydata: A 2-D array of audio samples from the file split into frames of length "samples_per_chunk"
+- ydata_for_line: A 1-D array of audio samples from the file
+The sample arrays are views of the memory-mapped file, so nothing is read until it is used.
 """
 def load_song(song_path, samples_per_chunk=2000):
 
-    # Get .wav file info
-    samplerate, data = wavfile.read(song_path)
-    duration_in_sec = librosa.get_duration(path=song_path)
-
-    # Determine number of channels
-    try:
-        _, num_of_channels = data.shape
-    except:
-        num_of_channels = 1
+    # Get .wav file info, duration and channels come from the header
+    samplerate, data = open_wav(song_path)
+    duration_in_sec = data.shape[0] / samplerate
+    num_of_channels = 1 if data.ndim == 1 else data.shape[1]
 
     # Process audio data based on channels
     if num_of_channels == 1:
-        ydata_for_line = list(data)
-        ydata = list(np.array_split(data, samplerate * duration_in_sec / samples_per_chunk))
+        ydata_for_line = data
+        ydata = frame_signal(data, samples_per_chunk)
     else:
-        ydata_for_line = list(data[:, 0]) # only take first channel
-        ydata = list(np.array_split(data[:, 1], samplerate * duration_in_sec / samples_per_chunk))
+        ydata_for_line = data[:, 0] # only take first channel
+        ydata = frame_signal(data[:, 1], samples_per_chunk)
 
     return samplerate, duration_in_sec, num_of_channels, ydata, ydata_for_line
 
+# Open a .wav file without reading its samples into memory
+"""
+Parameters:
+- song_path: Path string to audio file
+Returns:
+- samplerate: The sample rate of the audio file (Hz)
+- data: Array of samples (samples x channels for multi-channel files), memory-mapped when the format allows it
+"""
+def open_wav(song_path):
+
+    # scipy.io pulls in most of scipy, so it is only imported once a file is opened
+    from scipy.io import wavfile
+    try:
+        return wavfile.read(song_path, mmap=True)
+    except ValueError:
+        # Some formats (e.g. 24-bit) can't be memory-mapped
+        return wavfile.read(song_path)
+
+# Stream fixed-size frames from a .wav file
+"""
+Parameters:
+- song_path: Path string to audio file
+- samples_per_chunk: Number of samples per frame (default: 2000)
+- channel: Channel to read from multi-channel files (default: 0)
+Yields:
+- 1-D arrays of "samples_per_chunk" samples, read from the file as they are requested
+"""
+def stream_frames(song_path, samples_per_chunk=2000, channel=0):
+
+    _, data = open_wav(song_path)
+    if data.ndim > 1:
+        data = data[:, channel]
+
+    for frame in frame_signal(data, samples_per_chunk):
+        yield frame
+
+# Split audio samples into consecutive fixed-size frames
+"""
+Parameters:
+- samples: 1-D array of audio samples
+- samples_per_chunk: Number of samples per frame (default: 2000)
+Returns:
+- A 2-D array (frames x samples_per_chunk) viewing the samples without copying them.
+  A trailing partial frame shorter than "samples_per_chunk" is dropped.
+"""
+def frame_signal(samples, samples_per_chunk=2000):
+
+    samples = np.asarray(samples)
+    num_of_frames = len(samples) // samples_per_chunk
+
+    return samples[:num_of_frames * samples_per_chunk].reshape(num_of_frames, samples_per_chunk)
+
 # Process frequency data from audio samples
 """
 Parameters:
-- ydata: List of chunks of audio samples
+- ydata: 2-D array of audio frames (frames x samples per frame), as returned by frame_signal
 - sample_rate: Sampling rate in Hz (default: 44100)
+- frames_per_block: Number of frames transformed at once, bounds the temporary memory used (default: 1024)
 Returns:
-- xf_list: List of chunks of samples frequencies
-- yf_list: List of chunks of values for sampled frequencies
+- xf: Array of the sampled frequencies, shared by every frame
+- yf: float32 matrix (frames x frequency bins) of values for the sampled frequencies
 """
-def process_frequency_data(ydata, samplerate=44100):
+def process_frequency_data(ydata, samplerate=44100, frames_per_block=1024):
 
-    xf_list = []
-    yf_list = []
+    from scipy.fft import rfft
 
-    # Get frequency spectrum
-    for data_chunk in ydata:
+    frames = np.asarray(ydata)
+    if frames.ndim != 2:
+        frames = frames.reshape(len(frames), -1)
+    num_of_frames, samples_per_chunk = frames.shape
 
-        # For empty or zero arrays
-        if len(data_chunk) == 0 or np.all(data_chunk == 0):
-            n = 2048 if len(data_chunk) == 0 else data_chunk.size
-            xf_list.append([0] * n)
-            yf_list.append([0] * n)
-            continue
+    # Frequency axis is the same for every frame, so compute it once
+    xf = np.fft.rfftfreq(samples_per_chunk, 1 / samplerate)
+    yf = np.zeros((num_of_frames, len(xf)), dtype=np.float32)
 
-        try:
-            # Safe normalization
-            max_val = np.max(np.abs(data_chunk))
-            if max_val > 0:
-                normalized_data = np.int16((data_chunk / max_val) * 32767)
-            else:
-                normalized_data = np.int16(data_chunk)
+    for start in range(0, num_of_frames, frames_per_block):
+        block = frames[start:start + frames_per_block]
 
-            xf_list.append(list(fftfreq(data_chunk.size, 1 / samplerate))) # Obtain FFT sample frequencies
-            yf_list.append(list(np.abs(fft(normalized_data)))) # Obtain sampled frequency values
+        # Silent (all zero) frames are masked out instead of being branched on
+        peaks = np.max(np.abs(block), axis=1)
+        silent = peaks == 0
 
-        except Exception as e:
-            print(f"Error processing frequency data: {e}")
-            # Add empty data as fallback
-            n = data_chunk.size if hasattr(data_chunk, 'size') else 2048
-            xf_list.append([0] * n)
-            yf_list.append([0] * n)
+        # Normalize every frame to the full 16-bit range
+        scale = np.where(silent, 0, 32767 / np.where(silent, 1, peaks))
+        normalized_data = (block * scale[:, np.newaxis]).astype(np.int16)
 
-    return xf_list, yf_list
+        # One FFT over the whole block of frames
+        yf[start:start + len(block)] = np.abs(rfft(normalized_data, axis=1))
+        yf[start:start + len(block)][silent] = 0
+
+    return xf, yf
 
 # Detect significant changes in average frequency content of audio
 """
@@ -90,107 +166,327 @@ Parameters:
 - window_size: FFT window size (default: 2048)
 - hop_size: Samples between consecutive windows (default: 1024)
 - sensitivity: Relative change threshold (0-1) (default: 0.3)
+- windows_per_block: Number of windows transformed at once, bounds the temporary memory used (default: 1024)
 Returns:
-- List of sample indices where significant frequency changes occurred
+- Array of sample indices where significant frequency changes occurred
 """
-def detect_frequency_changes(samples, sample_rate=44100, window_size=2048, hop_size=1024, sensitivity=0.3):
+def detect_frequency_changes(samples, sample_rate=44100, window_size=2048, hop_size=1024, sensitivity=0.3,
+                             windows_per_block=1024):
 
-    freqchange_idxs = []
-    prev_avg_freq = None
+    samples = np.asarray(samples)
     cooldown_frames = int(0.2 * sample_rate / hop_size)
-    cooldown_counter = 0
-
-    # Frequency bins for FFT
     freqs = np.fft.rfftfreq(window_size, 1/sample_rate)
+
+    # Skip low-energy windows
+    energies = window_energies(samples, window_size, hop_size)
+    centroids = np.empty(len(energies))
+    has_magnitude = np.empty(len(energies), dtype=bool)
+
+    for start in range(0, len(energies), windows_per_block):
+        stop = min(start + windows_per_block, len(energies))
+        segment = samples[start * hop_size:(stop - 1) * hop_size + window_size].astype(np.float64)
+        windows = sliding_window_view(segment, window_size)[::hop_size]
+
+        # Compute the FFT of every window in the block at once
+        magnitudes = np.abs(np.fft.rfft(windows, axis=1))
+        centroids[start:stop], has_magnitude[start:stop] = spectral_centroids(magnitudes, freqs)
+
+    # Windows that are too quiet or have no magnitude don't affect the detector at all
+    window_idxs = np.flatnonzero((energies >= 0.01) & has_magnitude)
+    changes = frequency_change_kernel(centroids[window_idxs], new_frequency_change_state(), cooldown_frames, sensitivity)
+
+    return window_idxs[changes] * hop_size
+
+# Compute the average frequency of spectrum frames
+"""
+Parameters:
+- magnitudes: 2-D array of FFT magnitudes (frames x frequency bins)
+- freqs: Frequency of each bin
+Returns:
+- centroids: Magnitude-weighted average frequency of each frame (only keeping the human hearing range)
+- has_magnitude: Boolean mask of the frames with any magnitude in the human hearing range
+"""
+def spectral_centroids(magnitudes, freqs):
+
     freq_mask = (freqs >= 20) & (freqs <= 20000) # only keep the frequencies in the human hearing range
-    valid_freqs = freqs[freq_mask]
+    magnitudes = magnitudes[:, freq_mask]
 
-    for i in range(0, len(samples) - window_size + 1, hop_size):
-        window = samples[i:i+window_size]
+    totals = np.sum(magnitudes, axis=1)
+    has_magnitude = totals > 0
+    centroids = np.sum(freqs[freq_mask] * magnitudes, axis=1) / np.where(has_magnitude, totals, 1)
 
-        # Skip low-energy windows
-        window_energy = np.mean(np.square(window))
-        if window_energy < 0.01:
-            continue
+    return centroids, has_magnitude
 
-        # Compute FFT
-        fft = np.fft.rfft(window)
-        magnitudes = np.abs(fft)[freq_mask]
+# Convert between Hz and the frequency scales the bands can be spaced on
+def hz_to_mel(freqs):
+    return 2595 * np.log10(1 + np.asarray(freqs) / 700)
 
-        # Skip zero-magnitude windows
-        if np.sum(magnitudes) == 0:
-            continue
+def mel_to_hz(mels):
+    return 700 * (10 ** (np.asarray(mels) / 2595) - 1)
+
+BAND_SCALES = {
+    "log": (np.log, np.exp),
+    "mel": (hz_to_mel, mel_to_hz),
+}
+MIN_BAND_FREQ = 30 # lowest band center (Hz), anything lower is felt rather than heard
 
-        # Compute average frequency of the window
-        avg_freq = np.sum(valid_freqs * magnitudes) / np.sum(magnitudes)
+# Build the matrix that reduces spectrum frames to log- or mel-spaced band energies
+"""
+Each band is a triangular filter centered on its frequency that reaches 0 at the centers of its neighbors,
+widened to at least one bin either side so the narrow low bands never fall between bins. The weights
+of each band sum to 1, so a band is the weighted average magnitude around its center. Built once per
+sample rate and FFT size, then "spectra @ matrix" reduces a whole block of frames in one product.
+
+Parameters:
+- samplerate: Sampling rate in Hz
+- window_size: FFT window size of the spectrum frames
+- num_of_bands: Number of bands (default: 128)
+- scale: Spacing of the band centers, "log" or "mel" (default: "log")
+Returns:
+- matrix: Read-only float32 matrix (frequency bins x bands)
+- centers: Center frequency of each band (Hz)
+"""
+@functools.lru_cache(maxsize=8)
+def band_matrix(samplerate, window_size, num_of_bands=128, scale="log"):
+
+    if scale not in BAND_SCALES:
+        raise ValueError(f"unknown band scale: {scale} (expected one of {', '.join(BAND_SCALES)})")
+    to_scale, from_scale = BAND_SCALES[scale]
+
+    freqs = np.fft.rfftfreq(window_size, 1 / samplerate)[:, np.newaxis]
+    bin_width = samplerate / window_size
+
+    # Band edges evenly spaced on the scale, every band's edges are its neighbors' centers
+    edges = from_scale(np.linspace(to_scale(MIN_BAND_FREQ), to_scale(samplerate / 2), num_of_bands + 2))
+    centers = edges[1:-1]
+    lower = np.minimum(edges[:-2], centers - bin_width)
+    upper = np.maximum(edges[2:], centers + bin_width)
+
+    rising = (freqs - lower) / (centers - lower)
+    falling = (upper - freqs) / (upper - centers)
+    weights = np.maximum(0, np.minimum(rising, falling))
+    matrix = (weights / weights.sum(axis=0)).astype(np.float32)
+
+    # The same arrays are returned to every caller
+    matrix.flags.writeable = False
+    centers.flags.writeable = False
+    return matrix, centers
+
+# Create the rolling state used by frequency_change_kernel
+"""
+Returns:
+- float64 array of [previous average frequency (NaN until the first window), cooldown counter]
+"""
+def new_frequency_change_state():
+    return np.array([np.nan, 0.0])
+
+# Run the frequency change detector's moving-average and cooldown state machine over average frequencies
+"""
+Parameters:
+- centroids: Array of average frequencies of consecutive (non-silent) windows
+- state: Rolling state from new_frequency_change_state, updated in place so consecutive calls can continue a stream
+- cooldown_frames: Number of windows skipped after a change
+- sensitivity: Relative change threshold (0-1)
+Returns:
+- int64 array of the indices into "centroids" where significant frequency changes occurred
+"""
+@lazy_jit
+def frequency_change_kernel(centroids, state, cooldown_frames, sensitivity):
+
+    change_idxs = np.empty(len(centroids), dtype=np.int64)
+    num_of_changes = 0
+
+    for i in range(len(centroids)):
+        avg_freq = centroids[i]
 
         # Make sure the value for the previous average frequency has a value
-        if prev_avg_freq is None:
-            prev_avg_freq = avg_freq
+        if np.isnan(state[0]):
+            state[0] = avg_freq
             continue
 
         # Apply cooldown
-        if cooldown_counter > 0:
-            cooldown_counter -= 1
-            prev_avg_freq = 0.9 * prev_avg_freq + 0.1 * avg_freq
+        if state[1] > 0:
+            state[1] -= 1
+            state[0] = 0.9 * state[0] + 0.1 * avg_freq
             continue
 
         # Calculate relative change
-        relative_change = abs(avg_freq - prev_avg_freq) / prev_avg_freq
+        relative_change = abs(avg_freq - state[0]) / state[0]
 
         # Add frequency index if the change is big enough
         if relative_change > sensitivity:
-            freqchange_idxs.append(i)
-            cooldown_counter = cooldown_frames
-            prev_avg_freq = avg_freq # Reset reference frequency value
+            change_idxs[num_of_changes] = i
+            num_of_changes += 1
+            state[1] = cooldown_frames
+            state[0] = avg_freq # Reset reference frequency value
         else:
-            prev_avg_freq = 0.9 * prev_avg_freq + 0.1 * avg_freq # Update moving average
+            state[0] = 0.9 * state[0] + 0.1 * avg_freq # Update moving average
 
-    return freqchange_idxs
+    return change_idxs[:num_of_changes]
 
 # Detect beats in audio samples using energy
 """
 Parameters:
-- samples: List of audio samples
+- samples: Array of audio samples
 - sample_rate: Sampling rate in Hz (default: 44100)
 - window_size: Number of samples per analysis window (default: 1024)
 - hop_size: Number of samples between consecutive windows (default: 512)
 - sensitivity: Beat detection sensitivity (higher = fewer beats) (default: 1.3)
 Returns:
-- List of sample indices where beats were detected
+- Array of sample indices where beats were detected
 """
 def detect_beats(samples, sample_rate=44100, window_size=1024, hop_size=512, sensitivity=1.3):
 
-    beat_idxs = []
-    avg_energy = 0.0
     cooldown_in_frames = int(0.1 * sample_rate / hop_size)
     init_frames = max(1, cooldown_in_frames) # Start after cooldown if cooldown comes after fill
-    energy_buffer = []
-    cooldown_counter = 0
 
-    for i in range(0, len(samples) - window_size + 1, hop_size):
+    energies = window_energies(samples, window_size, hop_size)
+    beat_windows = beat_kernel(energies, new_beat_state(), init_frames, cooldown_in_frames, sensitivity)
+
+    return beat_windows * hop_size  # Call the start of the window the start of the beat
+
+# Detect beats in many tracks at once
+"""
+Parameters:
+- tracks: List of arrays of audio samples
+- sample_rate: Sampling rate in Hz, either one for every track or a list with one per track (default: 44100)
+- window_size, hop_size, sensitivity: Same as detect_beats
+- workers: Number of tracks analyzed in parallel (default: one per CPU)
+Returns:
+- List with the array of beat sample indices for each track
+"""
+def detect_beats_batch(tracks, sample_rate=44100, window_size=1024, hop_size=512, sensitivity=1.3, workers=None):
+
+    sample_rates = sample_rate if np.ndim(sample_rate) else [sample_rate] * len(tracks)
+
+    # The energy computation and the compiled kernel both release the GIL, so threads run in parallel
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            lambda track, rate: detect_beats(track, rate, window_size, hop_size, sensitivity),
+            tracks, sample_rates))
+
+# Compute the normalized energy of every analysis window
+"""
+Parameters:
+- samples: Array of audio samples
+- window_size: Number of samples per analysis window
+- hop_size: Number of samples between consecutive windows
+- windows_per_block: Number of windows computed at once, bounds the temporary memory used (default: 4096)
+Returns:
+- float64 array with the mean squared sample value of each window
+"""
+def window_energies(samples, window_size, hop_size, windows_per_block=4096):
+
+    samples = np.asarray(samples)
+    num_of_windows = max(0, (len(samples) - window_size) // hop_size + 1)
+    energies = np.empty(num_of_windows)
+
+    for start in range(0, num_of_windows, windows_per_block):
+        stop = min(start + windows_per_block, num_of_windows)
+
+        # Strided view of the overlapping windows, squared and summed in float64 so integer samples can't overflow
+        segment = samples[start * hop_size:(stop - 1) * hop_size + window_size].astype(np.float64)
+        windows = sliding_window_view(segment, window_size)[::hop_size]
+        energies[start:stop] = np.einsum("ij,ij->i", windows, windows) / window_size
+
+    return energies
 
-        window = samples[i:i+window_size]
-        energy = sum(sample**2 for sample in window) / window_size  # Normalized energy
+# Create the rolling state used by beat_kernel
+"""
+Returns:
+- float64 array of [energies gathered during initialization, average energy, cooldown counter]
+"""
+def new_beat_state():
+    return np.zeros(3)
+
+# Run the beat detector's moving-average and cooldown state machine over window energies
+"""
+Parameters:
+- energies: Array of window energies, as returned by window_energies
+- state: Rolling state from new_beat_state, updated in place so consecutive calls can continue a stream
+- init_frames: Number of windows used to initialize the average energy
+- cooldown_in_frames: Number of windows skipped after a beat
+- sensitivity: Beat detection sensitivity (higher = fewer beats)
+Returns:
+- int64 array of the indices of the windows where beats were detected
+"""
+@lazy_jit
+def beat_kernel(energies, state, init_frames, cooldown_in_frames, sensitivity):
+
+    beat_windows = np.empty(len(energies), dtype=np.int64)
+    num_of_beats = 0
+
+    for i in range(len(energies)):
+        energy = energies[i]
 
         # Initialization phase - gather energy values until there's enough to make an average
-        if len(energy_buffer) < init_frames: # If we don't have enough energy values
-            energy_buffer.append(energy) # Add the ones we just got to the buffer
-            if len(energy_buffer) >= init_frames: # If we have enough, start the average
-                avg_energy = sum(energy_buffer) / len(energy_buffer)
+        if state[0] < init_frames:
+            state[0] += 1
+            state[1] += energy
+            if state[0] >= init_frames: # If we have enough, start the average
+                state[1] = state[1] / state[0]
             continue
 
         # Update moving average
-        avg_energy = 0.9 * avg_energy + 0.1 * energy
+        state[1] = 0.9 * state[1] + 0.1 * energy
 
         # Move on to the next window if we're still in the cooldown
-        if cooldown_counter > 0:
-            cooldown_counter -= 1
+        if state[2] > 0:
+            state[2] -= 1
             continue
 
         # Add beat if detected
-        if energy > avg_energy * sensitivity:
-            beat_idxs.append(i)  # Call the start of the window the start of the beat
-            cooldown_counter = cooldown_in_frames
+        if energy > state[1] * sensitivity:
+            beat_windows[num_of_beats] = i
+            num_of_beats += 1
+            state[2] = cooldown_in_frames
+
+    return beat_windows[:num_of_beats]
 
-    return beat_idxs
+# Create the rolling state used by envelope_kernel
+"""
+Parameters:
+- num_of_values: Number of values in each frame
+Returns:
+- float64 array of [envelope of every value..., loudest recent envelope value]
+"""
+def new_envelope_state(num_of_values):
+    return np.zeros(num_of_values + 1)
+
+# Smooth frames with attack/release envelope followers and normalize them to the loudest recent value
+"""
+Parameters:
+- frames: float32 matrix (frames x values) of e.g. spectrum frames or band energies
+- state: Rolling state from new_envelope_state, updated in place so consecutive calls can continue a stream
+- attack: Share of the previous envelope kept each frame while a value rises (0 jumps straight to it)
+- release: Share of the previous envelope kept each frame while a value falls
+- peak_decay: Share of the loudest value kept each frame, 1 keeps the loudest value so far
+Returns:
+- envelopes: float32 matrix of the envelopes divided by the loudest value, in the range 0-1
+- peaks: float64 array of the loudest value each frame was divided by
+"""
+@lazy_jit
+def envelope_kernel(frames, state, attack, release, peak_decay):
+
+    num_of_values = frames.shape[1]
+    envelopes = np.empty_like(frames)
+    peaks = np.empty(frames.shape[0])
+
+    for i in range(frames.shape[0]):
+        loudest = 0.0
+        for j in range(num_of_values):
+            value = frames[i, j]
+
+            # Follow rising values with the attack and falling ones with the release
+            coefficient = attack if value > state[j] else release
+            state[j] = value + coefficient * (state[j] - value)
+            loudest = max(loudest, state[j])
+
+        # The loudest value decays slowly so a quiet part isn't drawn as loud as the chorus
+        state[num_of_values] = max(loudest, state[num_of_values] * peak_decay)
+        peaks[i] = state[num_of_values]
+        scale = 1.0 / peaks[i] if peaks[i] > 0 else 0.0
+        for j in range(num_of_values):
+            envelopes[i, j] = state[j] * scale
+
+    return envelopes, peaks
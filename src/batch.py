@@ -0,0 +1,115 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .analysis import analyze_song, analysis_params, FEATURES
+from .cache import AnalysisCache, DEFAULT_CACHE_DIR
+from .visualizers import registry, required_features, GUI_FEATURES
+from .decoders import SUPPORTED_EXTENSIONS
+
+AUDIO_EXTENSIONS = SUPPORTED_EXTENSIONS # files the batch picks up when walking a directory
+
+
+def find_songs(paths, extensions=AUDIO_EXTENSIONS):
+    """Return every audio file in the given files and directories (searched recursively), sorted."""
+    songs = []
+    for path in paths:
+        if os.path.isfile(path):
+            songs.append(path)
+            continue
+        for directory, _, names in os.walk(path):
+            songs.extend(os.path.join(directory, name) for name in names if name.lower().endswith(extensions))
+    return sorted(songs)
+
+
+def limit_worker_threads():
+    """
+    Keep the BLAS and OpenMP libraries of a worker process to one thread, since every worker runs one
+    song at a time. Environment variables can't do this, the thread pools start when numpy is first
+    imported, before the workers are forked.
+    """
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(1)
+
+
+def analyze_file(song_path, params, cache_dir):
+    """
+    Analyze one song into the cache, runs in a worker process.
+
+    Returns:
+    - song_path: The song
+    - audio_seconds: Length of the song (sec)
+    - seconds: Time spent analyzing it (sec)
+    """
+    start_time = time.perf_counter()
+    analysis = analyze_song(song_path, cache=AnalysisCache(cache_dir), **params)
+    return song_path, analysis.frames_ready * analysis.hop_size / analysis.samplerate, time.perf_counter() - start_time
+
+
+def analyze_library(paths, workers=None, cache_dir=DEFAULT_CACHE_DIR, **params):
+    """
+    Analyze every song in the given files and directories into the analysis cache, in parallel.
+
+    Songs that are already cached with the same parameters are skipped, so an interrupted run picks up
+    where it stopped.
+
+    Parameters:
+    - paths: Files and directories to analyze
+    - workers: Number of worker processes (default: one per CPU)
+    - cache_dir: Directory of the AnalysisCache (default: ~/.cache/sound-visualizer)
+    - params: Parameters passed on to analyze
+    Returns:
+    - Number of songs analyzed
+    """
+    params = analysis_params(**params)
+    cache = AnalysisCache(cache_dir)
+    songs = find_songs(paths)
+    todo = [song_path for song_path in songs if not cache.contains(song_path, params)]
+    print(f"{len(songs)} songs found, {len(songs) - len(todo)} already cached, analyzing {len(todo)}")
+    if not todo:
+        return 0
+
+    start_time = time.perf_counter()
+    total_audio_seconds = 0.0
+    analyzed = 0
+    with ProcessPoolExecutor(workers, initializer=limit_worker_threads) as executor:
+        futures = {executor.submit(analyze_file, song_path, params, cache_dir): song_path for song_path in todo}
+        # The progress counts the failed songs too, the summary only the analyzed ones
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                song_path, audio_seconds, seconds = future.result()
+            except Exception as e:
+                print(f"[{done}/{len(todo)}] Error analyzing {futures[future]}: {e}")
+                continue
+            analyzed += 1
+            total_audio_seconds += audio_seconds
+            print(f"[{done}/{len(todo)}] {song_path}: {audio_seconds:.1f} s of audio in {seconds:.2f} s"
+                  f" ({audio_seconds / seconds:.0f}x real time)")
+    seconds = time.perf_counter() - start_time
+
+    print(f"Analyzed {analyzed} songs ({total_audio_seconds / 60:.1f} min of audio) in {seconds:.1f} s:"
+          f" {analyzed / seconds:.2f} songs/s, {total_audio_seconds / seconds:.0f}x real time")
+    return analyzed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze whole music libraries into the analysis cache, so the "
+                                                 "visualizer starts instantly on any of their songs.")
+    parser.add_argument("paths", nargs="+", help="audio files or directories (searched recursively)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="analysis cache directory")
+    parser.add_argument("--all-features", action="store_true",
+                        help="also keep the full spectrum, not just what the visualizers need")
+    args = parser.parse_args()
+
+    # By default compute the same features the GUI asks for, so its lookups hit the cache
+    features = FEATURES if args.all_features else required_features(registry, *GUI_FEATURES)
+    analyze_library(args.paths, args.workers, args.cache_dir, features=features)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from .analysis import Analysis
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "sound-visualizer")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Bump whenever the stored arrays or the analysis algorithms change, so old entries are never reused
+CACHE_VERSION = 6
+
+
+class AnalysisCache:
+    """
+    On-disk cache of Analysis results with size-based LRU eviction.
+
+    Entries are uncompressed .npz files named after a hash of the song's contents and the analysis
+    parameters, so changing either one makes the old entry unreachable. Hashing a long song takes a
+    while, so the hash of every file is remembered by path, size and modification time.
+
+    Parameters:
+    - cache_dir: Directory the entries are stored in (default: ~/.cache/sound-visualizer)
+    - max_bytes: Total size the entries may take before the least recently used are deleted (default: 2 GiB)
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, song_path, params):
+        """Return the cache key of a song analyzed with the given parameters."""
+        params_json = json.dumps(dict(params, version=CACHE_VERSION), sort_keys=True)
+        return hashlib.blake2b((self.file_digest(song_path) + params_json).encode(), digest_size=20).hexdigest()
+
+    def load(self, song_path, params):
+        """Return the cached Analysis of a song, or None if it hasn't been stored."""
+        start_time = time.perf_counter()
+        path = self.entry_path(self.key(song_path, params))
+        try:
+            with np.load(path) as data:
+                analysis = Analysis(int(data["samplerate"]), int(data["window_size"]), int(data["hop_size"]))
+                for name in data.files:
+                    value = data[name]
+                    setattr(analysis, name, value.item() if value.ndim == 0 else value)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # Mark the entry as recently used
+        os.utime(path)
+        analysis.timings = {"cache": time.perf_counter() - start_time}
+        return analysis
+
+    def store(self, song_path, params, analysis):
+        """Store the Analysis of a song, then evict old entries if the cache is too big."""
+        path = self.entry_path(self.key(song_path, params))
+        arrays = {name: np.asarray(value) for name, value in vars(analysis).items() if name != "timings"}
+
+        # Write to a temporary file first so a crash never leaves a half written entry
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(temp_path, path)
+
+        self.evict()
+
+    def contains(self, song_path, params):
+        """Check if a song analyzed with the given parameters is already cached."""
+        return os.path.exists(self.entry_path(self.key(song_path, params)))
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                # Another process sharing the cache may delete entries at the same time
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def file_digest(self, song_path):
+        """Hash the contents of a file, reusing the previous hash if the file hasn't changed."""
+        song_path = os.path.abspath(song_path)
+        stat = os.stat(song_path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+
+        index = self.read_index()
+        if song_path in index and index[song_path][:2] == signature:
+            return index[song_path][2]
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(song_path, "rb") as file:
+            while block := file.read(1 << 20):
+                digest.update(block)
+
+        index[song_path] = signature + [digest.hexdigest()]
+        self.write_index(index)
+        return digest.hexdigest()
+
+    def read_index(self):
+        try:
+            with open(self.index_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def write_index(self, index):
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(index, file)
+        os.replace(temp_path, self.index_path)
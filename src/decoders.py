@@ -0,0 +1,239 @@
+import os
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+
+BLOCK_SIZE = 1 << 20 # sample frames decoded per block, about 24 s at 44.1 kHz
+FULL_SCALE = 32768 # decoded samples are scaled so a full scale signal spans -FULL_SCALE..FULL_SCALE, like 16-bit audio
+
+
+class Decoder(ABC):
+    """
+    Base class of the decoders, which stream an audio file as float32 blocks without ever decoding
+    the whole file into memory.
+
+    Whatever the format stores (16/24/32-bit integers or floats), the samples are scaled to the range
+    of 16-bit audio (see FULL_SCALE). The analysis has absolute thresholds, like the silence gate of
+    the frequency change detector, that were tuned on 16-bit .wav files.
+
+    Subclasses set "extensions", the file extensions they are tried for, and implement read_blocks.
+
+    Attributes:
+    - samplerate: Sampling rate of the file (Hz)
+    - channels: Number of channels
+    - frames: Number of sample frames in the file, only an estimate for some formats (e.g. MP3)
+    - seconds: Time spent decoding so far (sec)
+    """
+
+    extensions = ()
+
+    def __init__(self):
+        self.samplerate = 0
+        self.channels = 0
+        self.frames = 0
+        self.seconds = 0.0
+
+    @abstractmethod
+    def read_blocks(self, block_size):
+        """Yield the samples as float32 arrays (frames x channels) of about block_size frames each."""
+
+    def blocks(self, block_size=BLOCK_SIZE):
+        """Yield the samples as float32 arrays (frames x channels), timing the decoding."""
+        decoded = self.read_blocks(block_size)
+        while True:
+            start_time = time.perf_counter()
+            block = next(decoded, None)
+            self.seconds += time.perf_counter() - start_time
+            if block is None:
+                return
+            yield block
+
+    def close(self):
+        """Release the file."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class WavDecoder(Decoder):
+    """Decode .wav files through a memory map, so only the block being converted is read."""
+
+    extensions = (".wav",)
+
+    def __init__(self, song_path):
+        super().__init__()
+        # Imported here, scipy.io takes longer to import than the window takes to open
+        from scipy.io import wavfile
+        # Formats that can't be memory-mapped (e.g. 24-bit) raise ValueError, soundfile streams those instead
+        self.samplerate, data = wavfile.read(song_path, mmap=True)
+        self.data = data if data.ndim > 1 else data[:, np.newaxis]
+        self.frames, self.channels = self.data.shape
+
+        # 8-bit .wav files are unsigned, every other integer format is signed and floats are -1..1
+        self.offset = 128 if self.data.dtype == np.uint8 else 0
+        if self.data.dtype.kind == "f":
+            self.scale = FULL_SCALE
+        else:
+            self.scale = FULL_SCALE / 2 ** (8 * self.data.dtype.itemsize - 1)
+
+    def read_blocks(self, block_size):
+        for start in range(0, self.frames, block_size):
+            block = self.data[start:start + block_size].astype(np.float32)
+            if self.offset:
+                block -= self.offset
+            if self.scale != 1:
+                block *= self.scale
+            yield block
+
+    def close(self):
+        self.data = None
+
+
+class SoundfileDecoder(Decoder):
+    """
+    Decode the formats libsndfile reads through soundfile: FLAC, OGG Vorbis/Opus, AIFF, and MP3 from
+    libsndfile 1.1 on. Also the fallback for .wav files scipy can't read.
+    """
+
+    extensions = (".flac", ".ogg", ".oga", ".opus", ".mp3", ".aiff", ".aif", ".wav")
+
+    def __init__(self, song_path):
+        super().__init__()
+        import soundfile
+        self.file = soundfile.SoundFile(song_path)
+        self.samplerate = self.file.samplerate
+        self.channels = self.file.channels
+        self.frames = self.file.frames
+
+    def read_blocks(self, block_size):
+        while True:
+            block = self.file.read(block_size, dtype="float32", always_2d=True)
+            if len(block) == 0:
+                return
+            block *= FULL_SCALE
+            yield block
+
+    def close(self):
+        self.file.close()
+
+
+class AudioreadDecoder(Decoder):
+    """
+    Decode through audioread, which uses whatever backend the system has (ffmpeg, GStreamer, Core
+    Audio...). Covers MP3 on older libsndfile versions, and AAC.
+    """
+
+    extensions = (".mp3", ".m4a", ".aac")
+
+    def __init__(self, song_path):
+        super().__init__()
+        import audioread
+        self.file = audioread.audio_open(song_path)
+        self.samplerate = self.file.samplerate
+        self.channels = self.file.channels
+        self.frames = int(self.file.duration * self.samplerate)
+
+    def read_blocks(self, block_size):
+        # The backends hand out small buffers of 16-bit samples, gather them into blocks
+        pending = []
+        pending_frames = 0
+        for buffer in self.file:
+            samples = np.frombuffer(buffer, dtype="<i2").reshape(-1, self.channels)
+            pending.append(samples)
+            pending_frames += len(samples)
+            if pending_frames >= block_size:
+                yield np.concatenate(pending).astype(np.float32)
+                pending = []
+                pending_frames = 0
+        if pending:
+            yield np.concatenate(pending).astype(np.float32)
+
+    def close(self):
+        self.file.close()
+
+
+class Resampler:
+    """
+    Resample a stream of mono blocks to another sampling rate, with soxr when it's installed.
+
+    Without soxr it falls back to linear interpolation, which is much faster than real time too but
+    doesn't filter out what's above the new Nyquist frequency.
+
+    Parameters:
+    - in_rate: Sampling rate of the incoming blocks (Hz)
+    - out_rate: Sampling rate to resample to (Hz)
+    """
+
+    def __init__(self, in_rate, out_rate):
+        try:
+            import soxr
+            self.stream = soxr.ResampleStream(in_rate, out_rate, 1, dtype="float32")
+        except ImportError:
+            self.stream = None
+        self.step = in_rate / out_rate
+        # Fallback state: input samples the next output samples lie between, and where the next one lies
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.position = 0.0
+
+    def resample(self, samples, last=False):
+        """
+        Resample the next block of samples.
+
+        Parameters:
+        - samples: 1-D float32 array following the samples passed before
+        - last: Whether this is the end of the stream, so everything held back is flushed
+        Returns:
+        - 1-D float32 array of the resampled samples that are complete so far
+        """
+        if self.stream is not None:
+            return self.stream.resample_chunk(np.asarray(samples, dtype=np.float32), last=last)
+
+        samples = np.concatenate([self.pending, samples])
+        # Every output sample whose two neighbouring input samples have arrived
+        count = int((len(samples) - 1 - self.position) // self.step) + 1 if len(samples) > self.position else 0
+        if count == 0:
+            self.pending = samples
+            return np.zeros(0, dtype=np.float32)
+        positions = self.position + np.arange(count) * self.step
+        resampled = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+        # The next output sample can lie past the end of this block, the samples it skips are carried over
+        next_position = self.position + count * self.step
+        kept_from = min(int(next_position), len(samples))
+        self.pending = samples[kept_from:]
+        self.position = next_position - kept_from
+        return resampled
+
+
+# Every decoder, in the order they are tried for a file
+DECODERS = [WavDecoder, SoundfileDecoder, AudioreadDecoder]
+SUPPORTED_EXTENSIONS = tuple(sorted({extension for decoder in DECODERS for extension in decoder.extensions}))
+
+
+def open_decoder(song_path):
+    """
+    Open an audio file with the first decoder that can read it.
+
+    Parameters:
+    - song_path: Path string to audio file
+    Returns:
+    - A Decoder of the file, to be closed after use
+    Raises:
+    - ValueError if the format isn't supported or no decoder could read the file
+    """
+    extension = os.path.splitext(song_path)[1].lower()
+    errors = []
+    for decoder_class in DECODERS:
+        if extension not in decoder_class.extensions:
+            continue
+        try:
+            return decoder_class(song_path)
+        except Exception as e:
+            # Missing optional library, backend or codec, try the next decoder
+            errors.append(f"{decoder_class.__name__}: {e}")
+    if not errors:
+        raise ValueError(f"unsupported audio format: {extension or song_path}")
+    raise ValueError(f"can't decode {song_path} ({'; '.join(errors)})")
@@ -0,0 +1,72 @@
+import numpy as np
+
+SEEK_BUCKET_SECONDS = 1.0 # width of the time buckets the seek index is made of
+
+
+class EventIndex:
+    """
+    Cursor over a sorted array of event times (e.g. Analysis.beats), for pulling the events that fired
+    since the last frame without rescanning the ones before them.
+
+    A seek index stores, for every SEEK_BUCKET_SECONDS of the song, the first event at or after the
+    start of that bucket, so seeking only looks at the events inside one bucket.
+
+    Parameters:
+    - times: Sorted array of event times (sec)
+    """
+
+    def __init__(self, times=()):
+        self.times = np.zeros(0)
+        self.bucket_starts = np.zeros(0, dtype=np.int64)
+        self.cursor = 0
+        self.extend(np.asarray(times, dtype=np.float64))
+
+    def extend(self, times):
+        """
+        Replace the times with a longer array that starts with the same events, as the background
+        analysis does when it finds more of them. The cursor stays where it was.
+        """
+        grew = len(times) > len(self.times)
+        self.times = times
+        if not grew:
+            return
+
+        # A bucket's first event is final once an event at or after the bucket's start has been found,
+        # since later events can only come after it
+        num_of_final_buckets = int(times[-1] // SEEK_BUCKET_SECONDS) + 1
+        known = len(self.bucket_starts)
+        if num_of_final_buckets > known:
+            bucket_times = np.arange(known, num_of_final_buckets) * SEEK_BUCKET_SECONDS
+            self.bucket_starts = np.concatenate([self.bucket_starts, np.searchsorted(times, bucket_times)])
+
+    def pop_until(self, time):
+        """
+        Return the events at or before "time" that haven't been returned yet.
+
+        Costs O(1) when no event fired and O(log n) otherwise.
+        """
+        cursor = self.cursor
+        if cursor >= len(self.times) or self.times[cursor] > time:
+            return self.times[cursor:cursor]
+
+        self.cursor = cursor + int(np.searchsorted(self.times[cursor:], time, side="right"))
+        return self.times[cursor:self.cursor]
+
+    def seek(self, time):
+        """
+        Move the cursor so the events at or before "time" count as already returned.
+
+        Costs O(1) for the bucket lookup plus a search among the events of that one bucket.
+        """
+        bucket = max(int(time // SEEK_BUCKET_SECONDS), 0)
+        if bucket >= len(self.bucket_starts):
+            # Past the last event
+            self.cursor = len(self.times)
+            return
+        start = int(self.bucket_starts[bucket])
+        end = int(self.bucket_starts[bucket + 1]) if bucket + 1 < len(self.bucket_starts) else len(self.times)
+        self.cursor = start + int(np.searchsorted(self.times[start:end], time, side="right"))
+
+    def last(self):
+        """Return the time of the last event at or before the cursor, None if there is none."""
+        return self.times[self.cursor - 1] if self.cursor > 0 else None
@@ -0,0 +1,190 @@
+import argparse
+import collections
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Render without a display, this has to be set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from .analysis import analyze_song
+from .cache import AnalysisCache, DEFAULT_CACHE_DIR
+from .constants import COLOR_MAPPING
+from .scheduler import FrameScheduler
+from .render import draw_beat_flash
+from .visualizers import registry, required_features, Frame, GUI_FEATURES
+
+DEFAULT_FPS = 30
+DEFAULT_SIZE = (1070, 400) # same size as the visualization in the window
+FRAMES_PER_TASK = 32 # number of frames a worker renders per task
+TASKS_PER_WORKER = 2 # number of tasks queued per worker, bounds the rendered frames waiting in memory
+VIDEO_FORMATS = (".mp4", ".webm", ".mkv", ".gif") # outputs that are piped to ffmpeg
+
+# State of each worker process, set up once by init_worker
+worker = {}
+
+
+def init_worker(song_path, params, cache_dir, mode, size, fps):
+    """Load the analysis and set up the visualizer once per worker process."""
+    pygame.init()
+    analysis = analyze_song(song_path, cache=AnalysisCache(cache_dir), **params)
+    worker.update(analysis=analysis, visualizer=registry[mode](), surface=pygame.Surface(size), fps=fps,
+                  scheduler=FrameScheduler(analysis.frame_rate),
+                  frame=Frame(analysis.freqs, band_freqs=analysis.band_freqs))
+    worker["frame"].peaks = analysis.peak_pyramid()
+    worker["frame"].duration = len(analysis.spectra) / analysis.frame_rate
+
+
+def render_frames(start, stop, output_dir=None):
+    """
+    Render the output frames from start to stop.
+
+    Parameters:
+    - start, stop: Range of output frame numbers
+    - output_dir: Save each frame there as a numbered .png (default: return them instead)
+    Returns:
+    - List of the raw RGB bytes of every frame, or the number of frames saved
+    """
+    analysis, visualizer, surface, frame = worker["analysis"], worker["visualizer"], worker["surface"], worker["frame"]
+    scheduler = worker["scheduler"]
+    colours = list(COLOR_MAPPING.keys())
+    rendered = []
+
+    for number in range(start, stop):
+        song_time = number / worker["fps"]
+        index, fraction = scheduler.frame_at(song_time, analysis.frames_ready)
+        frame.spectrum = scheduler.interpolate(analysis.spectra, index, fraction, "spectra")
+        frame.bands = scheduler.interpolate(analysis.bands, index, fraction, "bands")
+        frame.band_history = analysis.bands[:index + 1]
+        frame.song_time = song_time
+
+        # The colour changes and beat flashes the window would show at this time
+        colour = colours[np.searchsorted(analysis.freq_changes, song_time, side="right") % len(colours)]
+        beats_so_far = np.searchsorted(analysis.beats, song_time, side="right")
+        frame.time_since_beat = song_time - analysis.beats[beats_so_far - 1] if beats_so_far > 0 else None
+
+        visualizer.render(surface, frame, colour)
+        if frame.time_since_beat is not None:
+            draw_beat_flash(surface, frame.time_since_beat)
+
+        if output_dir is None:
+            rendered.append(pygame.image.tobytes(surface, "RGB"))
+        else:
+            pygame.image.save(surface, os.path.join(output_dir, f"frame_{number:06d}.png"))
+
+    return rendered if output_dir is None else stop - start
+
+
+def encoder_command(song_path, output_path, size, fps):
+    """Return the ffmpeg command that encodes raw RGB frames from stdin into output_path."""
+    command = ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24",
+               "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-"]
+    if output_path.lower().endswith(".gif"):
+        command += ["-vf", "split[a][b];[a]palettegen[p];[b][p]paletteuse"]
+    else:
+        # Mux the song in, so the video plays with its sound
+        command += ["-i", song_path, "-pix_fmt", "yuv420p"]
+    return command + [output_path]
+
+
+def ordered_results(executor, function, tasks, max_pending):
+    """
+    Run function(*task) for every task on the executor and yield the results in task order, with at
+    most max_pending tasks submitted but not collected yet.
+    """
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(executor.submit(function, *task))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def export(song_path, output_path, mode=0, size=DEFAULT_SIZE, fps=DEFAULT_FPS, workers=None,
+           cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Render a visualization of a whole song without a display.
+
+    Video and .gif outputs are piped in order to ffmpeg when it's installed, anything else (or any
+    output when ffmpeg is missing) is written as a .png sequence into a directory.
+
+    Parameters:
+    - song_path: Path string to audio file
+    - output_path: Video/.gif file, or directory for the .png sequence
+    - mode: Index of the visualizer in the registry (default: 0)
+    - size: (width, height) of the frames (default: DEFAULT_SIZE)
+    - fps: Output frames per second (default: 30)
+    - workers: Number of rendering processes (default: one per CPU)
+    - cache_dir: Directory of the AnalysisCache (default: ~/.cache/sound-visualizer)
+    Returns:
+    - Number of frames rendered per second
+    """
+    # Analyze (or load the cached analysis) once up front so every worker can load it from the cache.
+    # The same features as the window and the batch analyzer, so the songs they analyzed are reused
+    params = {"features": required_features(registry, *GUI_FEATURES)}
+    analysis = analyze_song(song_path, cache=AnalysisCache(cache_dir), **params)
+    num_of_frames = int(len(analysis.spectra) / analysis.frame_rate * fps)
+
+    use_encoder = output_path.lower().endswith(VIDEO_FORMATS)
+    if use_encoder and shutil.which("ffmpeg") is None:
+        output_path = os.path.splitext(output_path)[0]
+        print(f"ffmpeg not found, writing a .png sequence to {output_path} instead")
+        use_encoder = False
+    if not use_encoder:
+        os.makedirs(output_path, exist_ok=True)
+
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    tasks = [(start, min(start + FRAMES_PER_TASK, num_of_frames), None if use_encoder else output_path)
+             for start in range(0, num_of_frames, FRAMES_PER_TASK)]
+    # Spawned rather than forked workers, a forked worker would keep the encoder's stdin open after it's closed
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker,
+                             initargs=(song_path, params, cache_dir, mode, tuple(size), fps)) as executor:
+        encoder = None
+        if use_encoder:
+            encoder = subprocess.Popen(encoder_command(song_path, output_path, size, fps), stdin=subprocess.PIPE)
+
+        # Results are collected in task order, so the frames can go straight into the encoder
+        for frames in ordered_results(executor, render_frames, tasks, workers * TASKS_PER_WORKER):
+            if encoder is not None:
+                for frame in frames:
+                    encoder.stdin.write(frame)
+
+        if encoder is not None:
+            encoder.stdin.close()
+            if encoder.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed with exit code {encoder.returncode}")
+    seconds = time.perf_counter() - start_time
+
+    frames_per_second = num_of_frames / seconds if seconds > 0 else 0.0
+    print(f"Exported {num_of_frames} frames to {output_path} in {seconds:.1f} s: {frames_per_second:.1f} fps"
+          f" ({frames_per_second / fps:.1f}x real time)")
+    return frames_per_second
+
+
+def main():
+    names = [visualizer_class.name for visualizer_class in registry]
+    parser = argparse.ArgumentParser(description="Render a song's visualization to a video, .gif or .png sequence "
+                                                 "without a display.")
+    parser.add_argument("song_path", help="audio file to visualize")
+    parser.add_argument("output_path", help="output .mp4/.webm/.mkv/.gif file (needs ffmpeg) or .png directory")
+    parser.add_argument("--mode", choices=names, default=names[0], help="visualization mode")
+    parser.add_argument("--size", default=f"{DEFAULT_SIZE[0]}x{DEFAULT_SIZE[1]}", help="frame size, WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="output frames per second")
+    parser.add_argument("--workers", type=int, default=None, help="rendering processes (default: one per CPU)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="analysis cache directory")
+    args = parser.parse_args()
+
+    size = tuple(int(value) for value in args.size.lower().split("x"))
+    export(args.song_path, args.output_path, names.index(args.mode), size, args.fps, args.workers, args.cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
-import math
+import functools
+import random
+import numpy as np
 import pygame as py
-from constants import *
+from .constants import *
+from .decoders import FULL_SCALE
+from .render import allocations
 
 
 FPS = 60
-VALUES_PER_SECOND = 20
-DELTA = VALUES_PER_SECOND / FPS
 
 def init_pygame(song_path, samplerate):
     """Initialize pygame and load the song."""
@@ -19,18 +21,17 @@ def init_pygame(song_path, samplerate):
     # load the song to play with the animation
     py.mixer.music.load(song_path)
 #    return screen, clock
-def draw_frequency_spectrum(screen, xf, yf, color="BLUE"):
+def draw_frequency_spectrum(surface, xf, yf, color="BLUE"):
     """Draw the frequency spectrum visualization."""
     # Make sure we have enough data points
 #    height = 300
-    height = screen.get_height()
-    width = screen.get_width() 
+    height = surface.get_height()
+    width = surface.get_width() 
 
-    max_y = max(yf) if max(yf) > 0 else 1
-    min_y = min(yf)
+    # The analysis already normalized the values to 0-1
  
 
-    surface = py.Surface((width, height))
+    # Clear the surface, it's reused every frame
     surface.fill((0, 0, 0))
     #idk what below means
 
@@ -44,7 +45,7 @@ def draw_frequency_spectrum(screen, xf, yf, color="BLUE"):
                 #x_val = 10 + xf[i] / 40 if not np.isnan(xf[i]) else 10
                 x_val = (i/points_count) * width
                 #y_val = height - (yf[i] / 30000)*height if not np.isnan(yf[i]) else height
-                y_val = height - ((yf[i] - min_y) / (max_y - min_y)) * height * 0.9
+                y_val = float(height - yf[i] * height * 0.9)
                 points.append((x_val, y_val))
             except (TypeError, ValueError):
                 points.append((0, height))
@@ -71,195 +72,354 @@ def draw_frequency_spectrum(screen, xf, yf, color="BLUE"):
     # Draw the polygon if we have at least 3 points
     if len(points) >= 3:
         color_values = COLOR_MAPPING.get(color)
-        print(color_values)
         py.draw.polygon(surface, color_values, points)
         py.draw.lines(surface, (255, 255, 255), True, points, 1)
     return surface
 
 
-def draw_frequency_spectrum_circles(screen, xf, yf, color="BLUE"):
-    """Draw the frequency spectrum visualization as three separate circular arcs for low, medium, and high frequencies."""
-    # Setup dimensions
-    width = screen.get_width()
-    height = screen.get_height()
+CIRCLE_POINTS = 360 # number of points on each circle
 
+
+@functools.lru_cache(maxsize=8)
+def circle_geometry(width, height, num_of_values):
+    """
+    Precompute everything draw_frequency_spectrum_circles needs that only depends on the surface size
+    and the number of frequency values.
+
+    Returns:
+    - centers: Array (3 x 2) of the circle centers for the low, medium and high frequencies
+    - max_radius: Max radius for each circle
+    - unit_circle: Array (2 x CIRCLE_POINTS) of the cos and sin of every point's angle
+    - band_starts: Index of the first frequency value of each band
+    - point_idxs: Array (3 x CIRCLE_POINTS) of the frequency value shown at each point of each circle
+    - drawn_bands: Indices of the bands that have any frequency values
+    """
     # Define centers for our three circles
-    centers = [
+    centers = np.array([
         (width // 4, height // 2),  # Low frequencies (left)
         (width // 2, height // 2),  # Medium frequencies (center)
         (width * 3 // 4, height // 2)  # High frequencies (right)
-    ]
+    ], dtype=np.float64)
 
     # Max radius for each circle (slightly smaller to fit three circles)
     max_radius = int(min(width // 4, height // 2) * 0.8)
 
-    # Create a new surface
-    surface = py.Surface((width, height))
+    # Points in a full circle (0 to 2π)
+    angles = 2 * np.pi * np.arange(CIRCLE_POINTS) / CIRCLE_POINTS
+    unit_circle = np.array([np.cos(angles), np.sin(angles)])
+
+    # Split the frequency data into three bands (low, medium, high) and get the data point index
+    # proportional to the angle in each of them
+    part = num_of_values // 3
+    band_starts = np.array([0, part, 2 * part])
+    band_lengths = np.array([part, part, num_of_values - 2 * part])
+    point_idxs = band_starts[:, np.newaxis] + (np.arange(CIRCLE_POINTS) * band_lengths[:, np.newaxis]) // CIRCLE_POINTS
+    drawn_bands = np.flatnonzero(band_lengths > 0)
+
+    return centers, max_radius, unit_circle, band_starts, point_idxs, drawn_bands
+
+
+def draw_frequency_spectrum_circles(surface, xf, yf, color="BLUE"):
+    """Draw the frequency spectrum visualization as three separate circular arcs for low, medium, and high frequencies."""
+    # Setup dimensions
+    width = surface.get_width()
+    height = surface.get_height()
+
+    # Clear the surface, it's reused every frame
     surface.fill((0, 0, 0))
 
     # Make sure we have data
     if len(yf) == 0:
         return surface
 
-    # Split the frequency data into three bands (low, medium, high)
-    part = len(yf) // 3
-    freq_bands = [
-        yf[:part],  # Low frequencies
-        yf[part:2 * part],  # Medium frequencies
-        yf[2 * part:],  # High frequencies
-    ]
-
-    xf_bands = [
-        xf[:part],  # Low frequencies x values
-        xf[part:2 * part],  # Medium frequencies x values
-        xf[2 * part:],  # High frequencies x values
-    ]
-
-    # Draw each frequency band as a separate circle
-    for i, (band_xf, band_yf) in enumerate(zip(xf_bands, freq_bands)):
-        # No data
-        if len(band_yf) == 0:
-            continue
-
-        # Figure out which center to put data in
-        center_x, center_y = centers[i]
-
-        # Normalize the data for this band, this would determine the amplitude of the radius
-        max_y = max(band_yf) if band_yf else 0
-        min_y = min(band_yf) if band_yf else 0
-        normalized_data = [(y - min_y) / (max_y - min_y) if max_y > min_y else 0 for y in band_yf]
-
-        # Number of points to display (use fewer points for smoother circle)
-        points_count = 360
-
-        # Calculate points in a full circle
-        points = []
-        for j in range(points_count):
-            if j < len(band_xf) and j < len(normalized_data):
-                try:
-                    # Convert to polar coordinates - full circle (0 to 2π)
-                    angle = 2 * math.pi * (j / points_count)
-
-                    # Get the data point index proportional to the angle
-                    data_idx = int((j / points_count) * len(normalized_data))
-                    # In case of overflow, set it to the last index
-                    if data_idx >= len(normalized_data):
-                        data_idx = len(normalized_data) - 1
-
-                    # Normalize amplitude value
-                    normalized_y = normalized_data[data_idx]
-
-                    # Calculate radius based on frequency amplitude (higher amplitude = larger radius)
-                    # Increased minimum radius to 30% for better visibility
-                    radius = max_radius * (0.3 + normalized_y * 0.7)
-
-                    # Convert to cartesian coordinates
-                    x_val = center_x + radius * math.cos(angle)
-                    y_val = center_y + radius * math.sin(angle)
-
-                    points.append((x_val, y_val))
-                except (TypeError, ValueError):
-                    continue
-
-        # Draw filled polygon if we have enough points
-        if len(points) >= 3:
-            # Get color
-            color_values = COLOR_MAPPING.get(color)
-            py.draw.polygon(surface, color_values, points)
-            # Draw outlines for better visibility
-            py.draw.lines(surface, (255, 255, 255), True, points, 1)
+    centers, max_radius, unit_circle, band_starts, point_idxs, drawn_bands = circle_geometry(width, height, len(yf))
+
+    # The analysis already normalized the data to 0-1, this would determine the amplitude of the radius.
+    # All three circles share that scale, so they show how loud each range is compared to the others
+    normalized_data = np.asarray(yf, dtype=np.float64)[point_idxs]
+
+    # Calculate radius based on frequency amplitude (higher amplitude = larger radius)
+    # Increased minimum radius to 30% for better visibility
+    radius = max_radius * (0.3 + normalized_data * 0.7)
+
+    # Convert to cartesian coordinates, giving an array (3 x CIRCLE_POINTS x 2) of points
+    points = centers[:, np.newaxis, :] + radius[:, :, np.newaxis] * unit_circle.T[np.newaxis]
+
+    # Get color
+    color_values = COLOR_MAPPING.get(color)
+    for band in drawn_bands:
+        py.draw.polygon(surface, color_values, points[band])
+        # Draw outlines for better visibility
+        py.draw.lines(surface, (255, 255, 255), True, points[band], 1)
 
     return surface
 
 
-def draw_frequency_spectrum_light_spots(screen, xf, yf):
+SPOT_COUNT = 50 # number of light spots
+GLOW_LEVELS = 16 # number of glow sizes/brightnesses each spot's glow is rounded to
+GLOW_CACHE_SIZE = 1024 # number of pre-rendered glow sprites kept, enough for every level of every spot
+GLOW_ALPHA = 100 # constant alpha value for the glow
+
+
+@functools.lru_cache(maxsize=8)
+def light_spot_layout(width, height):
+    """
+    Compute the fixed positions and colors of the light spots for one surface size.
+
+    Parameters:
+    - width, height: Size of the surface the spots are drawn on
+    Returns:
+    - positions: List of the (x, y) center of each spot
+    - base_colors: Array (SPOT_COUNT x 3) of each spot's color at full brightness
+    - glow_sizes: Array of the glow radius at each glow level
+    - glow_colors: Array (SPOT_COUNT x GLOW_LEVELS x 3) of each spot's glow color at each glow level
+    """
+    # Fixed seed for consistency between frames, drawn in the same order as the original random layout
+    rng = random.Random(42)
+
+    positions = []
+    base_colors = []
+    for _ in range(SPOT_COUNT):
+        positions.append((rng.randint(0, width), rng.randint(0, height)))
+
+        # Generate random base color for this spot
+        base_colors.append((rng.randint(50, 255), rng.randint(50, 255), rng.randint(50, 255)))
+    base_colors = np.array(base_colors, dtype=np.float64)
+
+    # The glow is larger than the spot, its size and brightness follow the spot's rounded value
+    levels = np.arange(GLOW_LEVELS) / (GLOW_LEVELS - 1)
+    glow_sizes = (5 + levels * 40).astype(int) + 5
+    brightness = 0.3 + levels * 0.7
+    glow_colors = np.minimum(base_colors[:, np.newaxis, :] * brightness[:, np.newaxis], 255).astype(int)
+
+    return positions, base_colors, glow_sizes, glow_colors
+
+
+@functools.lru_cache(maxsize=GLOW_CACHE_SIZE)
+def glow_sprite(glow_size, color):
+    """Pre-render a transparent glow circle of the given radius and (r, g, b) color."""
+    glow_surface = py.Surface((glow_size * 2, glow_size * 2), py.SRCALPHA)
+    allocations.add()
+    glow_surface.fill((0, 0, 0, 0))  # Transparent background
+    py.draw.circle(glow_surface, (*color, GLOW_ALPHA), (glow_size, glow_size), glow_size)
+    return glow_surface
+
+
+def draw_frequency_spectrum_light_spots(surface, xf, yf):
     """
     Draw a visualization where frequencies are represented as glowing light spots
     that vary in size and brightness based on frequency data.
     """
     # Setup dimensions
-    width = screen.get_width()
-    height = screen.get_height()
+    width = surface.get_width()
+    height = surface.get_height()
 
-    # Create a new surface
-    surface = py.Surface((width, height))
+    # Clear the surface, it's reused every frame
     surface.fill((0, 0, 0))  # Black background
 
     # Make sure we have data
-    if len(yf) == 0 or max(yf) <= 0:
+    yf = np.asarray(yf, dtype=np.float64)
+    if len(yf) == 0 or yf.max() <= 0:
         return surface
 
-    # Normalize frequency data, this would determine the glow radius, by getting the data in the 0 to 1 range
-    max_y = max(yf)
-    min_y = min(yf)
-    normalized_data = [(y - min_y) / (max_y - min_y) if max_y > min_y else 0 for y in yf]
-
-    # Create a reduced set of data samples to work with
-    # Reduced sample size to 50
-    sample_count = 50  # This controls the number of light spots
-    samples = []
-    for i in range(sample_count):
-        idx = int(i * len(normalized_data) / sample_count)
-        if idx < len(normalized_data):
-            samples.append(normalized_data[idx])
-
-    # Generate fixed positions for the light spots
-    import random
-    random.seed(42)  # Fixed seed for consistency between frames
-
-    spot_positions = []
-    spot_colors = []
-    for _ in range(sample_count):
-        x = random.randint(0, width)
-        y = random.randint(0, height)
-        spot_positions.append((x, y))
+    positions, base_colors, glow_sizes, glow_colors = light_spot_layout(width, height)
 
-        # Generate random base color for this spot
-        r = random.randint(50, 255)
-        g = random.randint(50, 255)
-        b = random.randint(50, 255)
-        spot_colors.append((r, g, b))
+    # Take a reduced set of data samples, one per light spot, already normalized to the 0 to 1 range
+    # by the analysis, this would determine the glow radius
+    samples = yf[(np.arange(min(SPOT_COUNT, len(yf))) * len(yf)) // SPOT_COUNT]
+
+    # Size (min 5, max 45) and brightness based on frequency
+    sizes = (5 + samples * 40).astype(int)
+    brightness = 0.3 + samples * 0.7
+    spot_colors = np.minimum(base_colors[:len(samples)] * brightness[:, np.newaxis], 255).astype(int)
 
-    # Draw each light spot based on the
-    for i, value in enumerate(samples):
-        if i < len(spot_positions):
-            x, y = spot_positions[i]
-            base_color = spot_colors[i]
+    # Draw a filled circle for each spot
+    for position, size, spot_color in zip(positions, sizes.tolist(), spot_colors.tolist()):
+        py.draw.circle(surface, spot_color, position, size)
+
+    # Add the glows in one batch of cached sprites
+    glow_levels = np.rint(samples * (GLOW_LEVELS - 1)).astype(int).tolist()
+    glows = []
+    for i, level in enumerate(glow_levels):
+        glow_size = int(glow_sizes[level])
+        x, y = positions[i]
+        glows.append((glow_sprite(glow_size, tuple(glow_colors[i, level].tolist())),
+                      (x - glow_size, y - glow_size), None, py.BLEND_RGBA_ADD))
+    surface.blits(glows, doreturn=False)
+
+    return surface
 
-            # Size based on frequency (larger for higher frequencies)
-            size = int(5 + value * 40)  # Min size 5, max size 45
 
-            # Brightness based on frequency
-            brightness = 0.3 + value * 0.7
-            spot_color = (
-                int(min(base_color[0] * brightness, 255)),
-                int(min(base_color[1] * brightness, 255)),
-                int(min(base_color[2] * brightness, 255))
-            )
+WAVEFORM_ZOOM_SECONDS = 10 # length of the song shown by the zoomed in, scrolling waveform
+WAVEFORM_OVERVIEW_SHARE = 0.3 # share of the surface height taken by the whole song overview
+PLAYHEAD_COLOR = (255, 255, 255)
 
-            # Draw a filled circle for the spot
-            py.draw.circle(surface, spot_color, (x, y), size)
 
-            # Draw a filled circle for the spot
-            py.draw.circle(surface, spot_color, (x, y), size)
+def draw_waveform(surface, peaks, song_time=None, duration=None, color="BLUE"):
+    """
+    Draw the waveform of the whole song as an overview on top, and the WAVEFORM_ZOOM_SECONDS around
+    the playback time below it, scrolling as the song plays.
+
+    Both come from the level of the peak pyramid closest to one row per pixel column, so a frame costs
+    the same for a short clip and an hour-long song.
+
+    Parameters:
+    - surface: Surface to draw on, cleared first
+    - peaks: PeakPyramid of the samples analyzed so far
+    - song_time: Playback time (sec) (default: the latest sample, with the zoomed view ending there)
+    - duration: Length of the whole song (sec) (default: the length analyzed so far)
+    - color: Name of the waveform color in COLOR_MAPPING
+    """
+    width = surface.get_width()
+    height = surface.get_height()
+
+    # Clear the surface, it's reused every frame
+    surface.fill((0, 0, 0))
+
+    # Make sure we have data
+    if peaks is None or peaks.rows_ready == 0:
+        return surface
 
-            # Add one glow effect with a single glow circle
-            glow_size = size + 5  # The glow size is larger than the spot
-            glow_alpha = 100  # Constant alpha value for the glow
+    if song_time is None:
+        song_time = peaks.duration
+        zoom_start = song_time - WAVEFORM_ZOOM_SECONDS
+    else:
+        zoom_start = song_time - WAVEFORM_ZOOM_SECONDS / 2
+    duration = max(duration or 0, peaks.duration)
 
-            # Create a transparent surface for the glow
-            glow_surface = py.Surface((glow_size * 2, glow_size * 2), py.SRCALPHA)
-            glow_surface.fill((0, 0, 0, 0))  # Transparent background
+    color_values = COLOR_MAPPING.get(color)
+    overview_height = int(height * WAVEFORM_OVERVIEW_SHARE)
+    overview = py.Rect(0, 0, width, overview_height - 2)
+    zoomed = py.Rect(0, overview_height, width, height - overview_height)
 
-            # Draw the glow circle
-            glow_color = (spot_color[0], spot_color[1], spot_color[2], glow_alpha)
-            py.draw.circle(glow_surface, glow_color, (glow_size, glow_size), glow_size)
+    draw_peaks(surface, overview, *peaks.columns(0, duration, width), color_values)
+    draw_peaks(surface, zoomed, *peaks.columns(zoom_start, zoom_start + WAVEFORM_ZOOM_SECONDS, width), color_values)
+    py.draw.line(surface, (100, 100, 100), (0, overview_height - 1), (width, overview_height - 1))
 
-            # Blit the glow surface onto the main surface
-            surface.blit(glow_surface, (x - glow_size, y - glow_size), special_flags=py.BLEND_RGBA_ADD)
+    # Playheads
+    overview_x = int(song_time / duration * (width - 1))
+    zoomed_x = int((song_time - zoom_start) / WAVEFORM_ZOOM_SECONDS * (width - 1))
+    py.draw.line(surface, PLAYHEAD_COLOR, (overview_x, overview.top), (overview_x, overview.bottom))
+    py.draw.line(surface, PLAYHEAD_COLOR, (zoomed_x, zoomed.top), (zoomed_x, zoomed.bottom))
 
     return surface
 
+
+def draw_peaks(surface, rect, mins, maxs, color_values):
+    """Draw one min/max pair per pixel column as a single polygon filling the rect's height at full scale."""
+    scale = rect.height / 2 / FULL_SCALE
+    center = rect.centery
+    top = center - np.clip(maxs, -FULL_SCALE, FULL_SCALE) * scale
+    # At least one pixel thick, so silence still shows as a line
+    bottom = np.maximum(center - np.clip(mins, -FULL_SCALE, FULL_SCALE) * scale, top + 1)
+
+    xs = np.arange(rect.left, rect.left + len(mins))
+    points = np.concatenate([np.stack([xs, top], axis=1), np.stack([xs, bottom], axis=1)[::-1]])
+    py.draw.polygon(surface, color_values, points.tolist())
+
+
+SPECTROGRAM_RANGE_DB = 60 # values this far below full scale (1, as normalized by the analysis) are drawn black
+SPECTROGRAM_LEVELS = 256 # number of entries in each colormap
+
+
+class Waterfall:
+    """
+    Scrolling spectrogram: one column of pixels per frame, newest on the right, oldest scrolling off
+    the left.
+
+    The history is a surface used as a ring buffer. Every frame only the new columns are written,
+    straight into its pixels through a colormap lookup table, and the two parts on either side of the
+    newest column are blitted in order, so a frame costs O(height) however much history is shown.
+
+    Given the analysis frames up to the current one, column i of the ring always shows the analysis
+    frames whose index is i modulo the width, so the picture only depends on the song time: after a
+    seek, a mode switch or on a frame rendered out of order, the visible columns are rebuilt from the
+    frames instead of continuing from whatever was drawn last. Without them (a live stream) every call
+    adds one column.
+
+    Parameters:
+    - width, height: Size of the surface it's drawn on, one pixel column per frame of history
+    - num_of_values: Number of values per frame (e.g. bands), spread over the rows with the first at the bottom
+    """
+
+    def __init__(self, width, height, num_of_values):
+        self.width = width
+        # 32-bit so pixels2d can write whole pixels
+        self.history = py.Surface((width, height), 0, 32)
+        allocations.add()
+        self.history.fill((0, 0, 0))
+        self.cursor = width - 1
+        # Index of the newest analysis frame in the history and the colour it was drawn in
+        self.last_index = None
+        self.last_color = None
+
+        # The value drawn in each row, low frequencies at the bottom
+        self.row_values = (np.arange(height)[::-1] * num_of_values) // height
+
+        # Colormaps that fade from black through each colour to white, already mapped to pixel values
+        levels = np.linspace(0, 1, SPECTROGRAM_LEVELS)[:, np.newaxis]
+        self.colormaps = {}
+        for name, color in COLOR_MAPPING.items():
+            color = np.array(color, dtype=np.float64)
+            rgb = np.where(levels < 2 / 3, color * levels * 1.5, color + (255 - color) * (levels * 3 - 2))
+            self.colormaps[name] = py.surfarray.map_array(self.history, rgb.astype(int)[np.newaxis])[0]
+
+    def levels(self, values):
+        """Map frames of values (frames x values) to colormap levels (frames x rows)."""
+        # Decibels below full scale, so quiet parts still show
+        values = np.asarray(values, dtype=np.float64)[:, self.row_values]
+        decibels = 20 * np.log10(np.maximum(values, 1e-12))
+        return (np.clip(1 + decibels / SPECTROGRAM_RANGE_DB, 0, 1) * (SPECTROGRAM_LEVELS - 1)).astype(np.intp)
+
+    def write(self, columns, frames, color):
+        """Write frames of values (frames x values) into the given columns of the ring, None for black."""
+        colormap = self.colormaps.get(color, self.colormaps["BLUE"])
+        pixels = py.surfarray.pixels2d(self.history)
+        pixels[columns] = colormap[0] if frames is None else colormap[self.levels(frames)]
+        # Unlock the surface before blitting it
+        del pixels
+
+    def draw(self, surface, yf, color="BLUE", frames=None):
+        """
+        Draw the history into the surface.
+
+        Parameters:
+        - yf: Values of the current frame, added as the newest column when frames isn't given
+        - frames: Every analysis frame up to and including the current one (e.g. Analysis.bands[:index + 1])
+        """
+        # Make sure we have data
+        if len(yf) == 0:
+            surface.fill((0, 0, 0))
+            return surface
+
+        if frames is None:
+            self.cursor = (self.cursor + 1) % self.width
+            self.write([self.cursor], np.asarray(yf)[np.newaxis], color)
+            self.last_index = None
+        else:
+            index = len(frames) - 1
+            if (self.last_index is None or color != self.last_color
+                    or not self.last_index <= index <= self.last_index + self.width):
+                # Somewhere else in the song (or recoloured): rebuild every visible column, black before the start
+                first = index - self.width + 1
+                if first < 0:
+                    self.write(np.arange(first, 0) % self.width, None, color)
+            else:
+                first = self.last_index + 1
+            first = max(first, 0)
+            if first <= index:
+                self.write(np.arange(first, index + 1) % self.width, frames[first:index + 1], color)
+            self.cursor = index % self.width
+            self.last_index = index
+            self.last_color = color
+
+        # Oldest columns (right of the cursor) first, then up to the newest one
+        height = self.history.get_height()
+        oldest_width = self.width - self.cursor - 1
+        surface.blit(self.history, (0, 0), (self.cursor + 1, 0, oldest_width, height))
+        surface.blit(self.history, (oldest_width, 0), (0, 0, self.cursor + 1, height))
+        return surface
+
 '''
 maybe need folder instead of 1 file lol
 
@@ -1,6 +1,18 @@
+import time
 import pygame
-from graphics_generator import *
-from audio_processor import *
+from .graphics_generator import *
+from .audio_processor import *
+from .analysis import BackgroundAnalysis
+from .cache import AnalysisCache
+from .live import LiveAnalysis, MicrophoneInput, FileReplay
+from .scheduler import FrameScheduler
+from .events import EventIndex
+from .render import RenderContext, allocations, draw_beat_flash
+from .profiler import FrameProfiler
+from .visualizers import create_visualizers, required_features, Frame, GUI_FEATURES
+
+START_SECONDS = 3 # seconds of the song analyzed before playback starts
+SEEK_STEP_SECONDS = 5 # how far the left and right arrow keys skip
 
 
 '''
@@ -27,70 +39,210 @@ def draw_slider(screen, pos, size, val, min_val = 0, max_val=1):
     pygame.draw.rect(screen, (200, 200, 200), handle_rect)
     return slider_rect
 
-def draw_button(screen, text, position, size):
-    font = pygame.font.Font(pygame.font.get_default_font(), 24)
+def draw_time(context, seconds, position):
+    '''
+    draw a time as m:ss one character at a time, so no new text has to be rendered as it changes
+    '''
+    x, y = position
+    for char in f"{int(seconds) // 60}:{int(seconds) % 60:02d}":
+        char_surface = context.text(char, 20)
+        context.screen.blit(char_surface, (x, y))
+        x += char_surface.get_width()
+
+def draw_timeline(context, rect, song_time, duration, analyzed_time):
+    '''
+    playback timeline, the played part is light and the part analyzed so far darker,
+    with the position and the length of the song on either side
+    '''
+    screen = context.screen
+    pygame.draw.rect(screen, (30, 30, 30), rect)
+    if duration > 0:
+        analyzed_width = int(rect.width * min(analyzed_time / duration, 1))
+        played_width = int(rect.width * min(max(song_time / duration, 0), 1))
+        pygame.draw.rect(screen, (70, 70, 70), (rect.x, rect.y, analyzed_width, rect.height))
+        pygame.draw.rect(screen, (200, 200, 200), (rect.x, rect.y, played_width, rect.height))
+    draw_time(context, song_time, (rect.x - 60, rect.y - 4))
+    draw_time(context, duration, (rect.right + 15, rect.y - 4))
+
+def draw_button(context, text, position, size):
     button_rect = pygame.Rect(position, size)
-    pygame.draw.rect(screen, (50, 50, 50), button_rect)  
-    text_surface = font.render(text, True, (255, 255, 255))  
+    pygame.draw.rect(context.screen, (50, 50, 50), button_rect)  
+    text_surface = context.text(text, 24)
     text_rect = text_surface.get_rect(center=button_rect.center)
-    screen.blit(text_surface, text_rect)
+    context.screen.blit(text_surface, text_rect)
     return button_rect
 
-def startup_menu():
+def startup_menu(live_input=False, replay_path=None):
     pygame.init()
     pygame.display.set_caption("sound-visualizer")
     screen = pygame.display.set_mode((1070, 600))
     clock = pygame.time.Clock()
 
+    if live_input:
+        live(screen, clock, replay_path)
+        return
 
+    font = pygame.font.Font(pygame.font.get_default_font(), 36) 
+    text = font.render("Drag and drop a file", True, "White")
+    text_rect = text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2))
+    hint = pygame.font.Font(pygame.font.get_default_font(), 20).render("or press L for live input", True, "Gray")
+    hint_rect = hint.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 40))
     while True:
         screen.fill("black") 
-        font = pygame.font.Font(pygame.font.get_default_font(), 36) 
-        text = font.render("Drag and drop a file", True, "White")
-        text_rect = text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2))
-
         screen.blit(text, text_rect)
+        screen.blit(hint, hint_rect)
         pygame.display.flip()
         for event in pygame.event.get():
             if event.type == pygame.DROPFILE:
                 main(event.file, screen, clock)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_l:
+                live(screen, clock)
             elif event.type == pygame.QUIT:
                 pygame.quit()
                 return
 
-def visualize(visualization_surface, xf, yf, mode, colour):
-    match mode:
-        case 0:
-            visualization_surface = draw_frequency_spectrum(visualization_surface, xf, yf, colour)
-        case 1:
-            visualization_surface = draw_frequency_spectrum_circles(visualization_surface, xf, 
-                                                                    yf, colour)
-        case 2:
-            visualization_surface = draw_frequency_spectrum_light_spots(visualization_surface, xf, yf)
-    return visualization_surface
+def wait_for_analysis(job, screen, clock):
+    '''
+    keep the window responsive and show progress until the start of the song is analyzed,
+    returns False if the window was closed
+    '''
+    font = pygame.font.Font(pygame.font.get_default_font(), 36)
+    while not job.ready(START_SECONDS) and not job.done.is_set():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+
+        screen.fill("black")
+        text = font.render(f"Analyzing... {int(job.progress * 100)}%", True, "White")
+        screen.blit(text, text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2)))
+        pygame.display.flip()
+        clock.tick(FPS)
+    return True
+
+def live(screen, clock, replay_path=None):
+    '''
+    visualize live input from the microphone, or replay_path replayed in real time as a stand-in,
+    analyzing each block as it arrives
+    '''
+    try:
+        if replay_path is None:
+            source = MicrophoneInput(lambda block: live_analysis.push(block))
+        else:
+            source = FileReplay(replay_path, lambda block: live_analysis.push(block))
+            init_pygame(replay_path, source.samplerate)
+        visualizers = create_visualizers()
+        live_analysis = LiveAnalysis(source.samplerate, features=required_features(visualizers, *GUI_FEATURES))
+    except Exception as e:
+        print(f"Error opening live input: {e}")
+        return
+
+    source.start()
+    if replay_path is not None:
+        pygame.mixer.music.play()
+
+    colours = list(COLOR_MAPPING.keys())
+    curr_colour_index = 0
+    visualization_mode = 0
+    change_mode_button_pos = (30, 500)
+    change_mode_button_size = (100, 50)
+    screen_width, _ = screen.get_size()
+    context = RenderContext(screen, (0, 50, screen_width, 400))
+    frame = Frame(live_analysis.analysis.freqs, band_freqs=live_analysis.analysis.band_freqs)
+    last_beat_ticks = None
+
+    # F3 toggles the performance overlay
+    profiler = FrameProfiler(FPS)
+    running = True
+    while running:
+        profiler.start_frame()
+        screen.fill((0, 0, 0))
+        change_mode_button = draw_button(context, "Mode", change_mode_button_pos, change_mode_button_size)
+        for e in pygame.event.get():
+            if e.type == pygame.QUIT:
+                running = False
+            elif e.type == pygame.MOUSEBUTTONDOWN and change_mode_button.collidepoint(e.pos):
+                visualization_mode = (visualization_mode + 1) % len(visualizers)
+            elif e.type == pygame.KEYDOWN and e.key == pygame.K_F3:
+                profiler.toggle()
+        profiler.mark("events")
+
+        # Analyze whatever arrived since the last frame
+        beats, freq_changes = live_analysis.update()
+        curr_colour_index = (curr_colour_index + len(freq_changes)) % len(colours)
+        if len(beats) > 0:
+            last_beat_ticks = pygame.time.get_ticks()
+
+        profiler.mark("analysis")
+
+        analysis = live_analysis.analysis
+        if len(analysis.spectra) > 0:
+            frame.spectrum = analysis.spectra[-1]
+            frame.bands = analysis.bands[-1]
+            frame.peaks = analysis.peak_pyramid()
+            if last_beat_ticks is not None:
+                frame.time_since_beat = (pygame.time.get_ticks() - last_beat_ticks) / 1000
+            visualization_surface = visualize(context, visualizers[visualization_mode], frame,
+                                              colours[curr_colour_index])
+            if frame.time_since_beat is not None:
+                draw_beat_flash(visualization_surface, frame.time_since_beat)
+        profiler.mark("draw")
+        screen.blit(context.visualization_surface, context.vis_rect.topleft)
+        profiler.draw_overlay(screen, context.font(20))
+        profiler.mark("blit")
+
+        clock.tick(FPS)
+        profiler.mark("wait")
+        pygame.display.set_caption("Latency: " + live_analysis.latency_report())
+        pygame.display.update()
+        profiler.mark("flip")
+        context.end_frame()
+
+    source.stop()
+    print(f"Live input latency: {live_analysis.latency_report()}")
+    if profiler.enabled:
+        print(allocations.report())
+    pygame.quit()
+
+def visualize(context, visualizer, frame, colour):
+    '''
+    draw the frame with one of the visualizers into the render context's visualization surface and return it
+    '''
+    return visualizer.render(context.visualization_surface, frame, colour)
 
 
 
 def main(song_path, screen, clock):
     try:
-        # Load and process song data
-        samplerate, duration_in_sec, num_of_channels, ydata, ydata_for_line = load_song(song_path)
+        # Load and process song data on a worker thread, spectrum frames, beats and frequency changes
+        # all come from one analysis pass. Playback starts once the first few seconds are ready.
+        visualizers = create_visualizers()
+        job = BackgroundAnalysis(song_path, cache=AnalysisCache(),
+                                 features=required_features(visualizers, *GUI_FEATURES))
+        if not wait_for_analysis(job, screen, clock):
+            pygame.quit()
+            return
+        if job.error is not None:
+            raise job.error
+        analysis = job.analysis
+        samplerate = analysis.samplerate
+        reported = False
 
         # Safety check
-        if len(ydata) == 0 or len(ydata_for_line) == 0:
+        if len(analysis.spectra) == 0:
             print(f"Error: No data loaded from {song_path}")
             return
 
-        xf_list, yf_list = process_frequency_data(ydata, samplerate)
-        beats = detect_beats(ydata_for_line, samplerate)
-        freq_changes = detect_frequency_changes(ydata_for_line, samplerate)
-        beats = [beat/samplerate for beat in beats]
-        freq_changes = [freq/samplerate for freq in freq_changes]
+        xf, yf_list = analysis.freqs, analysis.spectra
+        yf = yf_list[0]
+        band_list = analysis.bands
+        frame = Frame(xf, yf, analysis.band_freqs, band_list[0])
+        frame.band_history = band_list[:1]
+        beat_index = EventIndex(analysis.beats)
+        freq_change_index = EventIndex(analysis.freq_changes)
 
         colours = list(COLOR_MAPPING.keys())
         curr_colour_index = 0
-        last_beat_time = 0
-        last_freq_change_time = 0
+        last_beat_time = None
         curr_colour = colours[curr_colour_index]
 
 
@@ -104,7 +256,7 @@ def main(song_path, screen, clock):
         # Initial state
         running = True
         playing = True
-        count = 0
+        scheduler = FrameScheduler(analysis.frame_rate)
         start = 0
         y_origin = 500
 
@@ -115,33 +267,81 @@ def main(song_path, screen, clock):
         change_mode_button_pos = (160, 500)
         change_mode_button_size = play_button_size
 
-        song_path = None
 
-        visualization_surface = None
         # Main loop
         #visualization 
         screen_width, screen_height = screen.get_size()
         vis_height = 400
-        vis_rect = pygame.Rect(0, 50, screen_width, vis_height)
+        context = RenderContext(screen, (0, 50, screen_width, vis_height))
+        vis_rect = context.vis_rect
+        visualization_surface = context.visualization_surface
         visualization_mode = 0
 
         #volume slider
         volume = 0.5
         volume_slider_rect = pygame.Rect(screen_width - 200, 10, 150, 20)
+
+        # Timeline, click or drag on it to seek, the arrow keys skip SEEK_STEP_SECONDS
+        timeline_rect = pygame.Rect(90, 465, screen_width - 180, 12)
+        curr_time = 0.0
+        scrubbing = False
+        seeked = False
+
+        def seek(song_time):
+            '''
+            jump to a position in the analyzed part of the song, restarting the mixer there and moving
+            the frame clock and the event cursors along without rescanning the events before it
+            '''
+            nonlocal curr_time, curr_colour_index, last_beat_time, seeked
+            curr_time = min(max(song_time, 0.0), max(analysis.frames_ready - 1, 0) / analysis.frame_rate)
+            pygame.mixer.music.play(start=curr_time)
+            if not playing:
+                pygame.mixer.music.pause()
+            scheduler.seek(curr_time)
+
+            beat_index.extend(analysis.beats)
+            freq_change_index.extend(analysis.freq_changes)
+            beat_index.seek(curr_time)
+            freq_change_index.seek(curr_time)
+            # The colour changes on every frequency change, so it follows from how many came before
+            curr_colour_index = freq_change_index.cursor % len(colours)
+            last_beat_time = beat_index.last()
+            frame.time_since_beat = None
+            seeked = True
+
+        # F3 toggles the performance overlay, F4 saves the profiled frames as a trace file
+        profiler = FrameProfiler(FPS)
         while running:
+            profiler.start_frame()
             screen.fill((0, 0, 0))
-            font = pygame.font.Font(pygame.font.get_default_font(), 20)
             
             volume_slider_rect = draw_slider(screen, (screen_width - 200, screen_height - 75), (150, 20), volume)
-            volume_text = font.render(f"{int(volume * 100)}%", True, (255, 255, 255))
+            volume_text = context.text(f"{int(volume * 100)}%", 20)
             screen.blit(volume_text, (screen_width - 250, screen_height - 75))
 
             button_text = "Pause" if playing else "Play"
             change_mode_button_text = "Mode"
-            play_button = draw_button(screen, button_text, play_button_pos,
+            play_button = draw_button(context, button_text, play_button_pos,
                                       play_button_size)
-            change_mode_button = draw_button(screen, change_mode_button_text,
+            change_mode_button = draw_button(context, change_mode_button_text,
                                              change_mode_button_pos, change_mode_button_size) 
+
+            duration = len(analysis.spectra) / analysis.frame_rate
+            draw_timeline(context, timeline_rect, curr_time, duration, analysis.frames_ready / analysis.frame_rate)
+
+            # Keep showing progress while the rest of the song is analyzed
+            if not job.done.is_set():
+                progress_text = context.text(f"Analyzing... {int(job.progress * 100)}%", 20)
+                screen.blit(progress_text, (290, 515))
+            elif not reported:
+                if job.error is not None:
+                    print(f"Error analyzing {song_path}: {job.error}")
+                else:
+                    print(f"Analyzed {song_path}: {analysis.report()}")
+                reported = True
+            profiler.mark("ui")
+
+            scrub_time = None
             for e in pygame.event.get():
                 if e.type == pygame.QUIT:
                     running = False
@@ -151,65 +351,100 @@ def main(song_path, screen, clock):
                             pygame.mixer.music.pause()
                         else:
                             pygame.mixer.music.unpause()
+                            scheduler.resume()
                         playing = not playing
+                    elif e.key == pygame.K_LEFT:
+                        seek(curr_time - SEEK_STEP_SECONDS)
+                    elif e.key == pygame.K_RIGHT:
+                        seek(curr_time + SEEK_STEP_SECONDS)
+                    elif e.key == pygame.K_F3:
+                        profiler.toggle()
+                    elif e.key == pygame.K_F4 and profiler.enabled:
+                        trace_path = f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json"
+                        print(f"Saved {profiler.dump_trace(trace_path)} profiled frames to {trace_path}")
                 elif e.type == pygame.MOUSEBUTTONDOWN:
-                    if play_button.collidepoint(e.pos):
+                    if timeline_rect.inflate(0, 16).collidepoint(e.pos):
+                        scrubbing = True
+                        scrub_time = (e.pos[0] - timeline_rect.x) / timeline_rect.width * duration
+                    elif play_button.collidepoint(e.pos):
                         if playing:
                             pygame.mixer.music.pause()
                         else:
                             pygame.mixer.music.unpause()
+                            scheduler.resume()
                         playing = not playing
                     elif change_mode_button.collidepoint(e.pos):
-                        visualization_mode = (visualization_mode + 1) % 3
-                        visualization_surface = visualize(visualization_surface, xf, yf, 
-                                                          visualization_mode, curr_colour)
+                        visualization_mode = (visualization_mode + 1) % len(visualizers)
+                        visualization_surface = visualize(context, visualizers[visualization_mode], frame,
+                                                          curr_colour)
+                elif e.type == pygame.MOUSEBUTTONUP:
+                    scrubbing = False
                 elif e.type == pygame.MOUSEMOTION:
-                    if e.buttons[0] and volume_slider_rect.collidepoint(e.pos):
+                    if scrubbing:
+                        scrub_time = (e.pos[0] - timeline_rect.x) / timeline_rect.width * duration
+                    elif e.buttons[0] and volume_slider_rect.collidepoint(e.pos):
                         volume = max(0, min(1, (e.pos[0] - volume_slider_rect.x)
                                              / volume_slider_rect.width))
                         pygame.mixer.music.set_volume(volume) 
-
-
-            # Frame count to move the visualization at the same rate the song plays
-            if playing:
-                curr_time = pygame.mixer.music.get_pos() / 1000.0
-                count += DELTA
-#                count = pygame.mixer.music.get_pos() 
-
-                for change_time in freq_changes:
-                    if last_freq_change_time < change_time and change_time <= curr_time:
-                        curr_colour_index = (curr_colour_index + 1) % len(colours)
-                        last_freq_change_time = change_time
-
-                for beat_time in beats:
-                    if last_beat_time < beat_time and beat_time <= curr_time:
-                        #do something
-                        last_beat_time = beat_time
-                        break
+            # Dragging along the timeline seeks at most once per frame
+            if scrub_time is not None:
+                seek(scrub_time)
+            profiler.mark("events")
+
+
+            # Follow the playback clock to move the visualization at the same rate the song plays,
+            # while paused only redraw after a seek
+            if playing or seeked:
+                curr_time = scheduler.song_time(pygame.mixer.music.get_pos(), duration)
+                seeked = False
+
+                # The worker thread replaces these as it finds more events
+                beat_index.extend(analysis.beats)
+                freq_change_index.extend(analysis.freq_changes)
+
+                # Only look at the events that fired since the last frame
+                new_freq_changes = freq_change_index.pop_until(curr_time)
+                curr_colour_index = (curr_colour_index + len(new_freq_changes)) % len(colours)
+
+                new_beats = beat_index.pop_until(curr_time)
+                if len(new_beats) > 0:
+                    last_beat_time = new_beats[-1]
+
+                # The worker thread replaces the frame arrays with bigger ones when the song turns out longer
+                # than the decoder estimated, so they're read again every frame. It replaces them before
+                # raising frames_ready, which is why that's read first.
+                frames_ready = analysis.frames_ready
+                yf_list, band_list = analysis.spectra, analysis.bands
             # Safety check for empty lists
-                if not xf_list or not yf_list:
+                if len(yf_list) == 0:
                     print("Warning: Empty frequency data")
                     continue
 
-                # Get x and y axes of the spectrum for the current instant
-                current_frame = min(int(count), len(xf_list) - 1)  # Prevent index out of range
-
-                # Another safety check
-                if current_frame < 0 or current_frame >= len(xf_list):
-                    current_frame = 0
-
-                xf, yf = xf_list[current_frame], yf_list[current_frame]
+                # Get the spectrum for the current instant, blending the frames on either side of it
+                # (the scheduler keeps the index within the analyzed frames)
+                current_frame, fraction = scheduler.frame_at(curr_time, frames_ready)
+                yf = scheduler.interpolate(yf_list, current_frame, fraction, "spectra")
+                frame.spectrum = yf
+                frame.bands = scheduler.interpolate(band_list, current_frame, fraction, "bands")
+                frame.band_history = band_list[:current_frame + 1]
+                frame.peaks = analysis.peak_pyramid()
+                frame.song_time = curr_time
+                frame.duration = duration
+                if last_beat_time is not None:
+                    frame.time_since_beat = curr_time - last_beat_time
 
                 
 
                 curr_colour = colours[curr_colour_index]
+                profiler.mark("analysis")
 
                 try:
                     # Draw visualizations
-                    visualization_surface = pygame.Surface((screen_width, vis_height))
-                    visualization_surface.fill((0,0,0))
-                    visualization_surface = visualize(visualization_surface, xf, yf, 
-                                                      visualization_mode, curr_colour)
+                    visualization_surface = visualize(context, visualizers[visualization_mode], frame,
+                                                      curr_colour)
+                    if frame.time_since_beat is not None:
+                        draw_beat_flash(visualization_surface, frame.time_since_beat)
+                    profiler.mark("draw")
 #                    pygame.draw.rect(visualization_surface, (100, 100, 100), vis_rect, 2)
                     screen.blit(visualization_surface, vis_rect.topleft)
                     # Start playing the song after first display is done
@@ -224,13 +459,21 @@ def main(song_path, screen, clock):
             
             if not playing and visualization_surface:
                 screen.blit(visualization_surface, vis_rect.topleft)
+            profiler.draw_overlay(screen, context.font(20))
+            profiler.mark("blit")
 
             # Update display
             clock.tick(FPS)
+            profiler.mark("wait")
             pygame.display.set_caption("FPS: " + str(int(clock.get_fps())))
             pygame.display.update()
+            profiler.mark("flip")
+            context.end_frame()
 
-        # Clean up
+        # Clean up, the diagnostics are only printed while the profiler (F3) is on
+        if profiler.enabled:
+            print(f"A/V sync: {scheduler.drift_report()}")
+            print(allocations.report())
         pygame.quit()
     except Exception as e:
         print(f"Fatal error in visualizer: {e}")
@@ -238,5 +481,12 @@ def main(song_path, screen, clock):
 
 
 
-if __name__ == "__main__":
-    startup_menu()
\ No newline at end of file
+def run(args):
+    '''
+    start the app from command line arguments, "--live" visualizes the microphone and
+    "--live <audio file>" replays the file as if it were live input
+    '''
+    if args and args[0] == "--live":
+        startup_menu(live_input=True, replay_path=args[1] if len(args) > 1 else None)
+    else:
+        startup_menu()
\ No newline at end of file
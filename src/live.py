@@ -0,0 +1,145 @@
+import collections
+import queue
+import threading
+import time
+import numpy as np
+from .analysis import StreamingAnalyzer
+from .audio_processor import compile_kernels
+from .decoders import open_decoder
+
+LATENCY_HISTORY = 1000 # number of blocks the latency statistics are computed over
+
+
+class LiveAnalysis:
+    """
+    Analyze audio blocks as they arrive from a capture callback.
+
+    Blocks are queued by push, which is safe to call from the audio thread, and analyzed by update,
+    which the render loop calls once per frame. The time from a block arriving to its results being
+    available is recorded for every block.
+
+    Parameters:
+    - samplerate: Sampling rate of the incoming audio in Hz
+    - params: Parameters passed on to StreamingAnalyzer
+    """
+
+    def __init__(self, samplerate, **params):
+        self.analyzer = StreamingAnalyzer(samplerate, keep_spectra=False, **params)
+        compile_kernels()
+        self.blocks = queue.Queue()
+        self.latencies = collections.deque(maxlen=LATENCY_HISTORY)
+
+    @property
+    def analysis(self):
+        """The rolling Analysis, its "spectra" holds the most recent frames."""
+        return self.analyzer.analysis
+
+    def push(self, block):
+        """Queue a block of samples, called by the audio source."""
+        self.blocks.put((time.perf_counter(), block))
+
+    def update(self):
+        """
+        Analyze every block that arrived since the last update.
+
+        Returns:
+        - beats: Array of the beat times (sec) found in the new blocks
+        - freq_changes: Array of the frequency change times (sec) found in the new blocks
+        """
+        beats = [np.zeros(0)]
+        freq_changes = [np.zeros(0)]
+        while True:
+            try:
+                arrival_time, block = self.blocks.get_nowait()
+            except queue.Empty:
+                break
+            _, block_beats, block_changes = self.analyzer.feed(block)
+            self.latencies.append(time.perf_counter() - arrival_time)
+            beats.append(block_beats)
+            freq_changes.append(block_changes)
+        return np.concatenate(beats), np.concatenate(freq_changes)
+
+    def latency_report(self):
+        """
+        Return the end-to-end latency statistics as a single printable line.
+
+        The block latency is how long a block waited between arriving and being analyzed, the window
+        latency is how much audio a spectrum frame needs before it can be computed at all.
+        """
+        window_latency = self.analyzer.window_size / self.analysis.samplerate * 1000
+        if not self.latencies:
+            return f"window: {window_latency:.1f} ms | no blocks yet"
+        p50, p95 = np.percentile(self.latencies, [50, 95]) * 1000
+        return (f"window: {window_latency:.1f} ms | block p50: {p50:.1f} ms | p95: {p95:.1f} ms"
+                f" | max: {max(self.latencies) * 1000:.1f} ms")
+
+
+class MicrophoneInput:
+    """
+    Capture audio from the first input device through SDL.
+
+    Parameters:
+    - callback: Called with every captured block of int16 samples, from SDL's audio thread
+    - samplerate: Sampling rate in Hz (default: 44100)
+    - block_size: Number of samples per block (default: 1024)
+    """
+
+    def __init__(self, callback, samplerate=44100, block_size=1024):
+        from pygame._sdl2.audio import AudioDevice, AUDIO_S16, get_audio_device_names
+
+        device_names = get_audio_device_names(True)
+        if not device_names:
+            raise RuntimeError("no audio input device found")
+
+        self.samplerate = samplerate
+        self.callback = callback
+        self.device = AudioDevice(devicename=device_names[0], iscapture=True, frequency=samplerate,
+                                  audioformat=AUDIO_S16, numchannels=1, chunksize=block_size, allowed_changes=0,
+                                  callback=self.on_audio)
+
+    def on_audio(self, device, memory):
+        # SDL reuses the buffer, so copy it before it leaves the callback
+        self.callback(np.frombuffer(memory, dtype=np.int16).copy())
+
+    def start(self):
+        self.device.pause(0)
+
+    def stop(self):
+        self.device.close()
+
+
+class FileReplay:
+    """
+    Stand-in for a capture device: replays an audio file mixed down to mono in real time from a thread.
+
+    Parameters:
+    - song_path: Path string to audio file, in any format decoders.open_decoder supports
+    - callback: Called with every block of samples, from the replay thread
+    - block_size: Number of samples per block (default: 1024)
+    """
+
+    def __init__(self, song_path, callback, block_size=1024):
+        self.decoder = open_decoder(song_path)
+        self.samplerate = self.decoder.samplerate
+        self.callback = callback
+        self.block_size = block_size
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        start_time = time.perf_counter()
+        samples_sent = 0
+        with self.decoder:
+            for block in self.decoder.blocks(self.block_size):
+                # Hand each block over once it would have finished playing
+                delay = start_time + (samples_sent + len(block)) / self.samplerate - time.perf_counter()
+                if self.stopped.wait(max(0, delay)):
+                    return
+                self.callback(block @ np.full(block.shape[1], 1 / block.shape[1], dtype=np.float32))
+                samples_sent += len(block)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,130 @@
+import numpy as np
+
+PEAK_BLOCK_SIZE = 256 # samples summarized by each row of the finest level of the peak pyramid
+
+
+class PeakPyramid:
+    """
+    Min/max peaks of a song at every power of two resolution, for drawing its waveform at any zoom in
+    time proportional to the width drawn.
+
+    Level 0 holds the min and max of every PEAK_BLOCK_SIZE samples, every next level the min and max
+    of pairs of rows of the level below. All levels live in one flat float32 array (rows x 2) so the
+    pyramid can be stored with the Analysis: with room for C rows (a power of two) at level 0, level k
+    has C >> k rows and starts at row 2 * C - 2 * (C >> k).
+
+    Parameters:
+    - samplerate: Sampling rate of the samples (Hz)
+    - peaks: The flat array of a pyramid built before, e.g. Analysis.peaks (default: an empty one)
+    - rows_ready: Number of level 0 rows of "peaks" filled in
+    - expected_samples: Total number of samples when it is known up front, so the array isn't regrown
+    """
+
+    def __init__(self, samplerate, peaks=None, rows_ready=0, expected_samples=None):
+        self.samplerate = samplerate
+        if peaks is None:
+            rows = 1 if expected_samples is None else -(-expected_samples // PEAK_BLOCK_SIZE)
+            peaks = np.zeros((2 * pyramid_capacity(rows) - 1, 2), dtype=np.float32)
+        self.peaks = peaks
+        self.rows_ready = rows_ready
+        # Samples of a block that isn't complete yet
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    @property
+    def capacity(self):
+        """Number of rows level 0 has room for."""
+        return (len(self.peaks) + 1) // 2
+
+    @property
+    def num_of_levels(self):
+        return self.capacity.bit_length()
+
+    def level(self, level):
+        """Return the rows of a level (min and max of PEAK_BLOCK_SIZE << level samples each)."""
+        start = 2 * self.capacity - 2 * (self.capacity >> level)
+        return self.peaks[start:start + (self.capacity >> level)]
+
+    def add(self, samples):
+        """
+        Summarize the next samples of the song into the pyramid, in one vectorized pass per level
+        that only touches the rows the new samples changed.
+        """
+        samples = np.concatenate([self.pending, np.asarray(samples, dtype=np.float32)])
+        num_of_blocks = len(samples) // PEAK_BLOCK_SIZE
+        self.pending = samples[num_of_blocks * PEAK_BLOCK_SIZE:]
+        blocks = samples[:num_of_blocks * PEAK_BLOCK_SIZE].reshape(num_of_blocks, PEAK_BLOCK_SIZE)
+        self.store(blocks.min(axis=1), blocks.max(axis=1))
+
+    def finish(self):
+        """Summarize the samples of the last, incomplete block."""
+        if len(self.pending):
+            self.store(self.pending.min(keepdims=True), self.pending.max(keepdims=True))
+            self.pending = self.pending[:0]
+
+    def store(self, mins, maxs):
+        """Append level 0 rows and update the rows of the levels above that cover them."""
+        rows_done, rows_ready = self.rows_ready, self.rows_ready + len(mins)
+        if rows_ready == rows_done:
+            return
+        if rows_ready > self.capacity:
+            self.grow(rows_ready)
+        self.level(0)[rows_done:rows_ready] = np.stack([mins, maxs], axis=1)
+        self.rows_ready = rows_ready
+
+        for level in range(1, self.num_of_levels):
+            # A half-filled pair is recomputed once its second row arrives
+            below = self.level(level - 1)[rows_done // 2 * 2:rows_ready]
+            pairs = np.arange(0, len(below), 2)
+            rows = self.level(level)
+            rows[rows_done // 2:(rows_ready + 1) // 2, 0] = np.minimum.reduceat(below[:, 0], pairs)
+            rows[rows_done // 2:(rows_ready + 1) // 2, 1] = np.maximum.reduceat(below[:, 1], pairs)
+            rows_done, rows_ready = rows_done // 2, (rows_ready + 1) // 2
+
+    def grow(self, rows_needed):
+        """Move every level into an array with room for at least rows_needed rows at level 0."""
+        grown = PeakPyramid(self.samplerate, rows_ready=0, expected_samples=rows_needed * PEAK_BLOCK_SIZE)
+        for level in range(self.num_of_levels):
+            rows_ready = -(-self.rows_ready // (1 << level))
+            grown.level(level)[:rows_ready] = self.level(level)[:rows_ready]
+        self.peaks = grown.peaks
+
+    @property
+    def duration(self):
+        """Length of the samples summarized so far (sec)."""
+        return (self.rows_ready * PEAK_BLOCK_SIZE + len(self.pending)) / self.samplerate
+
+    def columns(self, start_time, end_time, width):
+        """
+        Return the min and max of the samples in each of "width" columns spanning start_time to
+        end_time, from the coarsest level with at least one row per column. Costs O(width) at any zoom.
+
+        Returns:
+        - mins, maxs: float32 arrays of "width" values, zero where there are no samples
+        """
+        samples_per_column = max((end_time - start_time) * self.samplerate / width, 1)
+        level = min(max(int(np.log2(samples_per_column / PEAK_BLOCK_SIZE)), 0), self.num_of_levels - 1)
+        rows = self.level(level)[:-(-self.rows_ready // (1 << level))]
+
+        # The rows each column starts at, zoomed in past one row per column neighbouring columns share a row
+        row_times = np.linspace(start_time, end_time, width + 1) * self.samplerate / (PEAK_BLOCK_SIZE << level)
+        edges = np.floor(row_times).astype(np.int64)
+        # A column reaching into the song from before its start begins at its first row
+        inside = (row_times[1:] > 0) & (edges[:-1] < len(rows))
+        edges[:-1] = np.maximum(edges[:-1], 0)
+
+        mins = np.zeros(width, dtype=np.float32)
+        maxs = np.zeros(width, dtype=np.float32)
+        if inside.any():
+            first, last = np.flatnonzero(inside)[[0, -1]]
+            # Every column reduces the rows up to the start of the next one, or just its own row when
+            # the next one starts in the same row
+            starts = edges[first:last + 1]
+            visible = rows[starts[0]:min(max(edges[last + 1], starts[-1] + 1), len(rows))]
+            mins[first:last + 1] = np.minimum.reduceat(visible[:, 0], starts - starts[0])
+            maxs[first:last + 1] = np.maximum.reduceat(visible[:, 1], starts - starts[0])
+        return mins, maxs
+
+
+def pyramid_capacity(rows):
+    """Return the number of level 0 rows a pyramid makes room for: the next power of two."""
+    return 1 << max(rows - 1, 0).bit_length()
@@ -0,0 +1,113 @@
+import json
+import time
+import numpy as np
+from .render import allocations
+
+PHASES = ("ui", "events", "analysis", "draw", "blit", "wait", "flip") # in the order the render loop runs them
+PROFILE_HISTORY = 600 # number of frames the statistics and the trace cover
+DROPPED_FRAME_FACTOR = 1.5 # a frame taking this many frame intervals or more counts as dropped
+OVERLAY_REFRESH = 30 # frames between updates of the overlay text
+OVERLAY_COLORS = ((255, 255, 255), (0, 0, 0)) # text and background
+
+
+class FrameProfiler:
+    """
+    Time each phase of the render loop into a ring buffer.
+
+    The loop calls start_frame at the top of every frame and mark after each phase, which adds the
+    time since the previous mark to that phase. A phase that is skipped in a frame has its time counted
+    in the next mark. While disabled every call returns right away.
+
+    Parameters:
+    - fps: Frame rate the loop aims for, frames slower than DROPPED_FRAME_FACTOR intervals count as dropped
+    - history: Number of frames kept (default: PROFILE_HISTORY)
+    """
+
+    def __init__(self, fps, history=PROFILE_HISTORY):
+        self.enabled = False
+        self.frame_interval = 1 / fps
+        self.history = history
+        self.phase_index = {phase: i for i, phase in enumerate(PHASES)}
+        self.starts = np.zeros(history)
+        self.timings = np.zeros((history, len(PHASES)))
+        self.reset()
+
+    def reset(self):
+        """Forget every profiled frame."""
+        self.num_of_frames = 0
+        self.dropped_frames = 0
+        self.row = 0
+        self.last_mark = None
+        self.overlay = []
+
+    def toggle(self):
+        """Turn the profiler and its overlay on or off, starting with an empty history."""
+        self.enabled = not self.enabled
+        self.reset()
+
+    def start_frame(self):
+        """Finish the previous frame and start timing a new one."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.last_mark is not None:
+            if now - self.starts[self.row] >= DROPPED_FRAME_FACTOR * self.frame_interval:
+                self.dropped_frames += 1
+            self.num_of_frames += 1
+
+        self.row = self.num_of_frames % self.history
+        self.starts[self.row] = now
+        self.timings[self.row] = 0
+        self.last_mark = now
+
+    def mark(self, phase):
+        """Add the time since the previous mark to a phase of the current frame."""
+        # Also skipped until the first frame starts after being turned on
+        if not self.enabled or self.last_mark is None:
+            return
+        now = time.perf_counter()
+        self.timings[self.row, self.phase_index[phase]] += now - self.last_mark
+        self.last_mark = now
+
+    def completed_rows(self):
+        """Return the ring buffer rows of the finished frames, oldest first."""
+        count = min(self.num_of_frames, self.history - 1)
+        return (np.arange(self.num_of_frames - count, self.num_of_frames)) % self.history
+
+    def report(self):
+        """Return the frame time percentiles and per phase means as printable lines."""
+        rows = self.completed_rows()
+        if len(rows) == 0:
+            return ["no frames profiled yet"]
+        frame_times = self.timings[rows].sum(axis=1) * 1000
+        p50, p95, p99 = np.percentile(frame_times, [50, 95, 99])
+        phase_means = self.timings[rows].mean(axis=0) * 1000
+        return [f"frame p50: {p50:.1f} ms | p95: {p95:.1f} ms | p99: {p99:.1f} ms",
+                f"dropped: {self.dropped_frames} of {self.num_of_frames} frames",
+                " | ".join(f"{phase} {mean:.2f}" for phase, mean in zip(PHASES, phase_means))]
+
+    def draw_overlay(self, surface, font):
+        """Draw the report in the top left corner, re-rendering its text every OVERLAY_REFRESH frames."""
+        if not self.enabled:
+            return
+        if not self.overlay or self.num_of_frames % OVERLAY_REFRESH == 0:
+            self.overlay = [font.render(line, True, *OVERLAY_COLORS) for line in self.report()]
+            allocations.add(len(self.overlay))
+        for i, text in enumerate(self.overlay):
+            surface.blit(text, (5, 5 + i * (font.get_linesize() + 2)))
+
+    def dump_trace(self, path):
+        """
+        Write the profiled frames as a Chrome trace event file, which chrome://tracing and
+        https://ui.perfetto.dev can open.
+        """
+        rows = self.completed_rows()
+        events = []
+        for row in rows:
+            offset = (self.starts[row] - self.starts[rows[0]]) * 1e6
+            for phase, duration in zip(PHASES, self.timings[row] * 1e6):
+                events.append({"name": phase, "ph": "X", "ts": offset, "dur": duration, "pid": 0, "tid": 0})
+                offset += duration
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        return len(rows)
@@ -0,0 +1,102 @@
+import pygame
+
+FONT_SIZES = (20, 24, 36) # font sizes the UI uses, loaded once
+TEXT_COLOR = (255, 255, 255)
+BEAT_FLASH_SECONDS = 0.15 # how long the flash on a beat takes to fade out
+BEAT_FLASH_BRIGHTNESS = 60 # how much a beat brightens the visualization (0-255)
+
+
+class AllocationCounter:
+    """
+    Count the surfaces and fonts created while rendering, to check that steady-state frames create none.
+
+    Parameters:
+    - name: Name printed in the report
+    """
+
+    def __init__(self, name="render"):
+        self.name = name
+        self.count = 0
+        self.frame_start = 0
+        self.frames = 0
+        self.frames_with_allocations = 0
+
+    def add(self, count=1):
+        """Record that count surfaces or fonts were created."""
+        self.count += count
+
+    def end_frame(self):
+        """Finish a frame and return how many allocations happened during it."""
+        frame_allocations = self.count - self.frame_start
+        self.frame_start = self.count
+        self.frames += 1
+        if frame_allocations > 0:
+            self.frames_with_allocations += 1
+        return frame_allocations
+
+    def report(self):
+        """Return the allocation statistics as a single printable line."""
+        return (f"{self.name} allocations: {self.count} | frames: {self.frames}"
+                f" | frames that allocated: {self.frames_with_allocations}")
+
+
+# Shared by the render context and the sprite caches in graphics_generator
+allocations = AllocationCounter()
+
+
+class RenderContext:
+    """
+    Surfaces, fonts and text that the render loop reuses every frame instead of creating them again.
+
+    The visualization surface is allocated once and every visualizer draws into it. Static UI text
+    (button labels, volume and progress percentages) is rendered up front, other text is rendered the
+    first time it's asked for and kept.
+
+    Parameters:
+    - screen: The display surface
+    - vis_rect: Area of the screen the visualization is drawn in
+    """
+
+    def __init__(self, screen, vis_rect):
+        self.screen = screen
+        self.vis_rect = pygame.Rect(vis_rect)
+        self.visualization_surface = pygame.Surface(self.vis_rect.size)
+        self.fonts = {size: pygame.font.Font(pygame.font.get_default_font(), size) for size in FONT_SIZES}
+        allocations.add(1 + len(self.fonts))
+
+        self.texts = {}
+        for label in ("Play", "Pause", "Mode"):
+            self.text(label, 24)
+        for percent in range(101):
+            self.text(f"{percent}%", 20)
+            self.text(f"Analyzing... {percent}%", 20)
+        # Playback times are drawn one character at a time
+        for char in "0123456789:":
+            self.text(char, 20)
+
+    def font(self, size):
+        """Return the default font at the given size, loading it the first time."""
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.Font(pygame.font.get_default_font(), size)
+            allocations.add()
+        return self.fonts[size]
+
+    def text(self, text, size=24, color=TEXT_COLOR):
+        """Return the rendered surface of a piece of text, rendering it the first time."""
+        key = (text, size, color)
+        if key not in self.texts:
+            self.texts[key] = self.font(size).render(text, True, color)
+            allocations.add()
+        return self.texts[key]
+
+    def end_frame(self):
+        """Finish a frame, returns how many surfaces or fonts were created during it."""
+        return allocations.end_frame()
+
+
+def draw_beat_flash(surface, time_since_beat):
+    """Brighten the visualization right after a beat, fading out over BEAT_FLASH_SECONDS."""
+    strength = 1 - time_since_beat / BEAT_FLASH_SECONDS
+    if 0 < strength <= 1:
+        brightness = int(BEAT_FLASH_BRIGHTNESS * strength)
+        surface.fill((brightness, brightness, brightness), special_flags=pygame.BLEND_RGB_ADD)
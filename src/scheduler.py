@@ -0,0 +1,136 @@
+import time
+import numpy as np
+
+MAX_EXTRAPOLATION = 0.1 # never run the clock further than this (sec) past the mixer's last update
+DRIFT_HISTORY = 600 # number of clock updates the drift statistics are computed over
+
+
+class FrameScheduler:
+    """
+    Pick the analysis frame to draw from the playback clock instead of counting rendered frames.
+
+    pygame.mixer.music.get_pos only moves once per audio buffer, so between its updates the clock is
+    extrapolated with the wall clock. How far that extrapolation was off whenever the mixer catches up
+    is recorded as the drift, along with how many analysis frames were skipped or drawn twice.
+
+    get_pos counts from the last call to pygame.mixer.music.play, so after playing from a position
+    other than the start, seek tells the scheduler where that was.
+
+    Once the song has ended get_pos returns -1, then the clock holds at the end of the song.
+
+    Parameters:
+    - frame_rate: Number of analysis frames per second of audio
+    """
+
+    def __init__(self, frame_rate):
+        self.frame_rate = frame_rate
+        self.offset = 0.0
+        self.last_pos = None
+        self.last_pos_time = 0.0
+        self.last_frame = None
+        self.last_time = 0.0
+        self.buffers = {}
+
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+        self.frames_repeated = 0
+        self.drifts = np.zeros(DRIFT_HISTORY)
+        self.num_of_drifts = 0
+
+    def song_time(self, mixer_pos_ms, duration=None):
+        """
+        Return the current position in the song (sec).
+
+        Parameters:
+        - mixer_pos_ms: pygame.mixer.music.get_pos() for this frame
+        - duration: Length of the song (sec), held once it has ended (default: the last position returned)
+        """
+        if mixer_pos_ms < 0:
+            # Not playing: the song ended if the mixer had been playing since the last seek, otherwise
+            # it hasn't started yet. Either way the clock stands still and there's no drift to record.
+            if self.last_pos is not None and duration is not None:
+                self.last_time = max(self.last_time, duration)
+            return self.last_time
+
+        now = time.perf_counter()
+        pos = self.offset + mixer_pos_ms / 1000.0
+
+        if pos != self.last_pos:
+            # Record how far the extrapolated clock had drifted from the mixer
+            if self.last_pos is not None:
+                predicted = self.last_pos + min(now - self.last_pos_time, MAX_EXTRAPOLATION)
+                self.drifts[self.num_of_drifts % DRIFT_HISTORY] = predicted - pos
+                self.num_of_drifts += 1
+            self.last_pos = pos
+            self.last_pos_time = now
+
+        self.last_time = pos + min(now - self.last_pos_time, MAX_EXTRAPOLATION)
+        return self.last_time
+
+    def resume(self):
+        """Restart the extrapolation after playback was paused."""
+        self.last_pos = None
+
+    def seek(self, song_time):
+        """
+        Restart the clock at a new position, right after pygame.mixer.music.play(start=song_time).
+        The jump isn't counted as drift or as skipped frames.
+        """
+        self.offset = song_time
+        self.last_time = song_time
+        self.last_pos = None
+        self.last_frame = None
+
+    def frame_at(self, song_time, frames_ready):
+        """
+        Map a position in the song to an analysis frame in O(1).
+
+        Parameters:
+        - song_time: Position in the song (sec)
+        - frames_ready: Number of analysis frames available
+        Returns:
+        - index: Index of the frame at or before song_time
+        - fraction: How far (0-1) song_time is between that frame and the next one
+        """
+        position = min(max(song_time * self.frame_rate, 0.0), max(frames_ready - 1, 0))
+        index = int(position)
+
+        # Frames skipped or repeated to stay in sync with the audio
+        if self.last_frame is not None:
+            if index == self.last_frame:
+                self.frames_repeated += 1
+            elif index > self.last_frame + 1:
+                self.frames_skipped += index - self.last_frame - 1
+        self.last_frame = index
+        self.frames_drawn += 1
+
+        return index, position - index
+
+    def interpolate(self, frames, index, fraction, name="spectra"):
+        """
+        Blend two adjacent rows of a frame matrix into a reused buffer.
+
+        Parameters:
+        - frames: Matrix (frames x values), e.g. Analysis.spectra
+        - index, fraction: As returned by frame_at
+        - name: Which buffer to blend into, one per frame matrix (default: "spectra")
+        Returns:
+        - Array of the blended values, overwritten by the next call with the same name
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != frames.shape[1:]:
+            buffer = self.buffers[name] = np.zeros(frames.shape[1:], dtype=np.float32)
+
+        next_index = min(index + 1, len(frames) - 1)
+        np.subtract(frames[next_index], frames[index], out=buffer)
+        buffer *= fraction
+        buffer += frames[index]
+        return buffer
+
+    def drift_report(self):
+        """Return the A/V sync statistics as a single printable line."""
+        drifts = np.abs(self.drifts[:min(self.num_of_drifts, DRIFT_HISTORY)]) * 1000
+        mean_drift = drifts.mean() if len(drifts) else 0.0
+        max_drift = drifts.max() if len(drifts) else 0.0
+        return (f"drift mean: {mean_drift:.1f} ms | max: {max_drift:.1f} ms | frames drawn: {self.frames_drawn}"
+                f" | skipped: {self.frames_skipped} | repeated: {self.frames_repeated}")
@@ -0,0 +1,147 @@
+from abc import ABC, abstractmethod
+from .graphics_generator import (draw_frequency_spectrum, draw_frequency_spectrum_circles,
+                                draw_frequency_spectrum_light_spots, circle_geometry, light_spot_layout, draw_waveform,
+                                Waterfall)
+
+# Every visualizer class, in the order the mode button cycles through them
+registry = []
+GUI_FEATURES = ("beats", "frequency changes") # analysis features the beat flash and colour changes need
+
+
+def register(visualizer_class):
+    """Class decorator that adds a visualizer to the registry."""
+    registry.append(visualizer_class)
+    return visualizer_class
+
+
+def create_visualizers():
+    """Return an instance of every registered visualizer."""
+    return [visualizer_class() for visualizer_class in registry]
+
+
+def required_features(visualizers, *extra):
+    """
+    Return the analysis features (see analysis.FEATURES) any of the visualizers needs.
+
+    Parameters:
+    - visualizers: Visualizer instances or classes
+    - extra: Features needed by the caller itself
+    """
+    return tuple(sorted(set(extra).union(*(visualizer.requires for visualizer in visualizers))))
+
+
+class Frame:
+    """
+    The analysis data a visualizer draws for the current instant. One instance is updated in place
+    every frame.
+
+    Attributes:
+    - freqs: Frequency of each spectrum bin (Hz)
+    - spectrum: FFT magnitudes of the current frame
+    - band_freqs: Center frequency of each band (Hz)
+    - bands: Band energies of the current frame
+    - band_history: Band energies of every analysis frame up to and including the current one, None on a
+      live stream
+    - time_since_beat: Seconds since the last beat, None before the first one
+    - peaks: PeakPyramid of the samples analyzed so far
+    - song_time: Current playback time (sec), None on a live stream, which is drawn up to its latest sample
+    - duration: Length of the whole song (sec), None on a live stream
+    """
+
+    def __init__(self, freqs=None, spectrum=None, band_freqs=None, bands=None, time_since_beat=None):
+        self.freqs = freqs
+        self.spectrum = spectrum
+        self.band_freqs = band_freqs
+        self.bands = bands
+        self.band_history = None
+        self.time_since_beat = time_since_beat
+        self.peaks = None
+        self.song_time = None
+        self.duration = None
+
+
+class Visualizer(ABC):
+    """
+    Base class of the visualization modes.
+
+    Subclasses set "name" and "requires", the analysis features they read from the Frame, and implement
+    draw. Precomputation that only depends on the surface size and the analysis goes in prepare, which
+    runs again only when one of those changes.
+    """
+
+    name = ""
+    requires = ()
+
+    def __init__(self):
+        self.prepared_for = None
+
+    def prepare(self, width, height, frame):
+        """One-time precomputation for a surface size and the shape of the frame data."""
+
+    @abstractmethod
+    def draw(self, surface, frame, colour):
+        """Draw the frame into the surface, which is reused every frame."""
+
+    def render(self, surface, frame, colour):
+        """Prepare if needed, then draw the frame into the surface and return it."""
+        key = (surface.get_size(), None if frame.spectrum is None else len(frame.spectrum),
+               None if frame.bands is None else len(frame.bands))
+        if key != self.prepared_for:
+            self.prepare(surface.get_width(), surface.get_height(), frame)
+            self.prepared_for = key
+        self.draw(surface, frame, colour)
+        return surface
+
+
+@register
+class SpectrumVisualizer(Visualizer):
+    name = "Spectrum"
+    requires = ("bands",)
+
+    def draw(self, surface, frame, colour):
+        draw_frequency_spectrum(surface, frame.band_freqs, frame.bands, colour)
+
+
+@register
+class CirclesVisualizer(Visualizer):
+    name = "Circles"
+    requires = ("bands",)
+
+    def prepare(self, width, height, frame):
+        circle_geometry(width, height, len(frame.bands))
+
+    def draw(self, surface, frame, colour):
+        draw_frequency_spectrum_circles(surface, frame.band_freqs, frame.bands, colour)
+
+
+@register
+class LightSpotsVisualizer(Visualizer):
+    name = "Light spots"
+    requires = ("bands",)
+
+    def prepare(self, width, height, frame):
+        light_spot_layout(width, height)
+
+    def draw(self, surface, frame, colour):
+        draw_frequency_spectrum_light_spots(surface, frame.band_freqs, frame.bands)
+
+
+@register
+class WaveformVisualizer(Visualizer):
+    name = "Waveform"
+    requires = ("waveform",)
+
+    def draw(self, surface, frame, colour):
+        draw_waveform(surface, frame.peaks, frame.song_time, frame.duration, colour)
+
+
+@register
+class SpectrogramVisualizer(Visualizer):
+    name = "Spectrogram"
+    requires = ("bands",)
+
+    def prepare(self, width, height, frame):
+        self.waterfall = Waterfall(width, height, len(frame.bands))
+
+    def draw(self, surface, frame, colour):
+        self.waterfall.draw(surface, frame.bands, colour, frame.band_history)